@@ -10,12 +10,13 @@
 #
 
 import sys
-import os
-import re
-import csv
 
+from census2011_common import parseGeographyUID, selectProvinces, rejects, RowConverter, \
+        TopicScript
+import census2011_columnar as columnar
 
-provinceCodes = {'BC':59}
+
+provinces = selectProvinces( None )
 geoLevels = [
         {'name':'Province', 'code':'PR', 'codeLength':2},
         {'name':'Census Division', 'code':'CD', 'codeLength':4},
@@ -47,127 +48,140 @@ dataColumns = [
         '90 to 94 years',
         '95 to 99 years',
         '100 years and over' ]
+dataTypes = ['text'] + ['count'] * (len(dataColumns) - 1)
+convertRow = RowConverter( dataTypes )
 
 
-def createOutputFiles( stub ):
-    openFiles = []
-    for i in geoLevels:
-        newFile = stub + '_' + i['code'] + '.csv'
-        print ">>createOutputFiles - creating: " + newFile
-        f = open( newFile, 'w' )
-        openFiles.append( f )
-    return openFiles
-
-
-def writeHeader( fileList ):
-    for f in fileList:
-        f.write( columnHeaders +'\n' )
-
-
-def formatData( d ):
+def formatData( row, check=True ):
+    # row holds the dataColumns, Geography first
+    # check=False leaves the totals check to the columnar engine
     rowId = False
-    row = [d[i] for i in dataColumns]
-    searchId = re.search(r"\((\d+)\)", d['Geography'])
-    if searchId:
-        if int(searchId.groups()[0][0:2]) == provinceCodes['BC']:
-            if checkData( row ):
-                rowId = int( searchId.groups()[0] ) 
+    uid = parseGeographyUID( row[0] )
+    if uid:
+        if provinces.prefixProvince( uid ):
+            if checkData( row, check ):
+                rowId = int( uid )
+        else:
+            rejects.add( 'filter', 'province', row, uid )
+    else:
+        rejects.add( 'filter', 'no UID', row )
     return rowId,row
 
 
-def checkData( d ):
+def checkData( d, check=True ):
+    # converts d in place to the dataTypes (suppressed cells become None)
+    # and, with check, compares the total with the sum of the age groups
     try:
-        total = int( float(d[1]))
-        s = sum( [int(float(i)) for i in d[2:]] )
-    except:
-        print ">>intfloatERROR: "
-        print d
+        d[:] = convertRow( d )
+    except ValueError:
+        rejects.add( 'validate', 'not a number', d )
         return False
-    else:
-        if abs(total - s) < 50:
-            return True
+    if (not check) or (d[1] is None):
+        return True
+    if abs( d[1] - sum( [n for n in d[2:] if n is not None] )) < 50:
+        return True
+    rejects.add( 'validate', 'total mismatch', d )
+    return False
+
+
+def iterColumnar( csvReader ):
+    # formatData over batches of rows, checkData done on the whole batch;
+    # rows failing the batch check go through checkData for its report
+    for batch in columnar.batches( csvReader ):
+        batch = [formatData( line, False ) for line in batch]
+        candidates = [data for rowId, data in batch if rowId]
+        valid = iter( columnar.validTotals( candidates ) )
+        for rowId, data in batch:
+            if rowId and not next( valid ) and not checkData( data ):
+                rowId = False
+            yield rowId, data
+
+
+def combineRecord( id, name, rA, rB ):
+    if (rA[0] is None) or (rB[0] is None):
+        return [id, name, None] + rA + rB
+    return [id, name, rA[0] + rB[0]] + rA + rB 
+
+
+def checkSorted( rows, name ):
+    lastId = None
+    for rowId, data in rows:
+        if (lastId is not None) and (rowId <= lastId):
+            raise ValueError( "%s is not sorted by UID at %d" % (name, rowId) )
+        lastId = rowId
+        yield rowId, data
+
+
+def hashJoin( csvA, csvB ):
+    # yields id, rowA, rowB in UID order; a missing row is None
+    for id in sorted( set(csvA).union(csvB) ):
+        yield id, csvA.get( id ), csvB.get( id )
+
+
+def mergeJoin( rowsA, rowsB ):
+    # same as hashJoin, but both inputs must already be sorted by UID
+    end = (None, None)
+    a = next( rowsA, end )
+    b = next( rowsB, end )
+    while (a is not end) or (b is not end):
+        if (b is end) or ((a is not end) and (a[0] < b[0])):
+            yield a[0], a[1], None
+            a = next( rowsA, end )
+        elif (a is end) or (b[0] < a[0]):
+            yield b[0], None, b[1]
+            b = next( rowsB, end )
         else:
-            print ">>difference: " + str( abs(total-s))
-            return False
-
-
-def getDictionaryFromCSV( inputFile ):
-    print ">>getDictionaryFromCSV:" + inputFile.name
-    csvDictionary = {}
-    csvReader = csv.DictReader( inputFile )
-    csvReader.fieldnames = [field.strip() for field in csvReader.fieldnames]
-    for line in csvReader:
-        rowId, data = formatData( line )
-        if rowId:
-            csvDictionary[ rowId ] = data
+            yield a[0], a[1], b[1]
+            a = next( rowsA, end )
+            b = next( rowsB, end )
+
+
+def iterRows( script, csvReader ):
+    # formatData of the rows read, or iterColumnar with --numpy
+    if script.columnarEngine:
+        return iterColumnar( csvReader )
+    return (formatData( line ) for line in csvReader)
+
+
+def iterRecords( script, inputFiles, streaming=False, pool=None ):
+    # yields output records [id, name, TOTALPOP, male..., female...]
+    # streaming: inputs are sorted by UID and merge-joined as they are read,
+    # otherwise both are loaded and hash-joined
+    if streaming:
+        print ">>iterRecords - streaming: " + ', '.join( [f.name for f in inputFiles] )
+        rowsA,rowsB = [checkSorted( script.streamRows( file, pool ), file.name ) for file in inputFiles]
+        joined = mergeJoin( rowsA, rowsB )
+    else:
+        csvA,csvB = [script.getDictionaryFromCSV( file, pool ) for file in inputFiles]
+        joined = hashJoin( csvA, csvB )
+
+    pairs = pairRows( joined )
+    if script.columnarEngine:
+        for batch in columnar.batches( pairs ):
+            totals = columnar.sumColumns( [rA[0] for id, name, rA, rB in batch], [rB[0] for id, name, rA, rB in batch] )
+            for (id, name, rA, rB), total in zip( batch, totals ):
+                yield [id, name, total] + rA + rB
+    else:
+        for id, name, rA, rB in pairs:
+            yield combineRecord( id, name, rA, rB )
+
+
+def pairRows( joined ):
+    # yields id, name, male row, female row; a missing side is nullRecord
+    for id, rowA, rowB in joined:
+        if (rowA is not None) and (rowB is not None):
+            yield id, rowA[0], rowA[1:], rowB[1:]
+        elif (rowA is not None):
+            rejects.add( 'join', 'no female row', rowA, id )
+            yield id, rowA[0], rowA[1:], nullRecord
         else:
-            #print "rejected: " + ','.join(data)
-            pass
-            
-    return csvDictionary
-
-
-def outputRecord( id, name, rA, rB, outputFiles):
-    combinedRecord = [id, name, int( float(rA[0]) + float(rB[0]) )] + rA + rB 
-    for i in range(0, len(geoLevels)):
-        if id < 10 ** geoLevels[i]['codeLength']:
-            outputFiles[i].write( ','.join( [str(f) for f in combinedRecord] ) + '\n')
-            break
-
-
-def processCensus( inputFiles, outputFiles ):
-    #process input files as CSVs
-    csvA,csvB = [getDictionaryFromCSV( file ) for file in inputFiles]
+            rejects.add( 'join', 'no male row', rowB, id )
+            yield id, rowB[0], nullRecord, rowB[1:]
 
-    for id in sorted( set(csvA.keys() + csvB.keys())):
-        if (id in csvA.keys()) & (id in csvB.keys()):
-            outputRecord( id, csvA[id][0], csvA[id][1:], csvB[id][1:], outputFiles ) 
-        elif (id in csvA.keys()):
-            print ">>processCensus: missing B:" + str(id)
-            outputRecord( id, csvA[id][0], csvA[id][1:], nullRecord, outputFiles ) 
-        else:  # id in csvB.keys()
-            print ">>processCensus: missing A:" + str(id)
-            outputRecord( id, csvB[id][0], nullRecord, csvB[id][1:], outputFiles ) 
 
-
-def closeFiles( fileList ):
-    for f in fileList:
-        print ">>closeFiles - closing:" + f.name 
-        f.close()
-
-
-def getCommandLine():
-    if (len(sys.argv) ==4):
-        if os.path.isfile( sys.argv[1] ) & os.path.isfile( sys.argv[2] ):
-            return sys.argv[1],sys.argv[2],sys.argv[3]
-    return "","",""
-
-
-def printUsage():
-    print "Usage:"
-    print "python " + sys.argv[0] + " <INPUT_MALE.csv> <INPUT_FEMALE.csv> <OUTPUTSTUB>\n"
+script = TopicScript( sys.modules[__name__], "Format Census 2011", ['INPUT_MALE.csv', 'INPUT_FEMALE.csv'],
+        streamUsage="inputs are sorted by UID; merge-join them as they are read", numpy=True )
 
 
 if __name__ == "__main__":
-    print "Format Census 2011"
-
-    inputFileNameA,inputFileNameB,outputStub = getCommandLine()
-    if (not inputFileNameA) & (not inputFileNameB):
-        printUsage()
-        sys.exit(1)
-
-    else:
-        print "Reading: %s, %s" % (inputFileNameA, inputFileNameB)
-        print "Exporting: %s" % outputStub
-
-        inputFiles = []
-        inputFiles.append( open( inputFileNameA ))
-        inputFiles.append( open( inputFileNameB ))
-        outputFiles = createOutputFiles( outputStub )
-
-        writeHeader( outputFiles )
-        processCensus( inputFiles, outputFiles )
-        closeFiles( inputFiles + outputFiles )
-
-
-
+    script.main()
@@ -0,0 +1,230 @@
+###########################################################
+# census2011_batch.py
+#
+# Run several census2011_* topic scripts at once from a
+# manifest, one process per job, as many at a time as the
+# machine has cores.
+#
+# Manifest lines (CSV, '#' starts a comment):
+#   topic,OUTPUTSTUB,INPUT.csv[,INPUT2.csv]
+# e.g.
+#   age,out/age,age_male.csv,age_female.csv
+#   income,out/income,income.csv
+#
+# What each job was built from (input hashes, schema,
+# options) and the checksums of what it wrote are kept in a
+# build file next to the manifest.  A job whose inputs,
+# schema and options are unchanged and whose outputs are
+# still intact is skipped.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import sys
+import os
+import csv
+import imp
+import glob
+import json
+import time
+import hashlib
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+import census2011_common
+from census2011_common import getOption
+from census2011_cache import fileHash
+
+
+scriptDir = os.path.dirname( os.path.abspath( __file__ ))
+topicScripts = {
+        'age':'census2011_age.py',
+        'education':'census2011_education.py',
+        'households':'census2011_households.py',
+        'income':'census2011_income.py',
+        'labour':'census2011_labour.py',
+        'language':'census2011_langauge.py' }
+topicInputs = {'age':2}  # number of input files, 1 if not listed
+jobFiles = {'rejects':'_rejects.csv', 'metrics':'_metrics.json'}  # per-job files of these options
+outputCode = ['census2011_common.py', 'census2011_columnar.py', 'census2011_sort.py']  # modules the outputs depend on
+
+
+def readManifest( manifestFile ):
+    jobs = []
+    errors = []
+    for row in csv.reader( manifestFile ):
+        row = [field.strip() for field in row]
+        if (not row) or (not row[0]) or row[0].startswith( '#' ):
+            continue
+        topic, stub, inputs = row[0], row[1] if len(row) > 1 else '', row[2:]
+        if topic not in topicScripts:
+            errors.append( "unknown topic: " + topic )
+        elif (not stub) or (len(inputs) != topicInputs.get( topic, 1 )):
+            errors.append( "%s needs an output stub and %d input file(s)" % (topic, topicInputs.get( topic, 1 )) )
+        else:
+            for inputFileName in inputs:
+                if not os.path.isfile( inputFileName ):
+                    errors.append( "%s: no such input file: %s" % (topic, inputFileName) )
+            jobs.append( {'topic':topic, 'stub':stub, 'inputs':inputs} )
+    return jobs, errors
+
+
+def schemaFingerprint( topic, _fingerprints={} ):
+    # hash of the topic script's column, type and geography definitions and
+    # of the code that writes its outputs, so that changing either (or
+    # upgrading the scripts) rebuilds the jobs
+    if topic not in _fingerprints:
+        module = imp.load_source( 'census2011_schema_' + topic, os.path.join( scriptDir, topicScripts[topic] ))
+        schema = [getattr( module, name, None ) for name in ('dataColumns', 'dataTypes', 'dataDictionary',
+                                                            'columnHeaders', 'geoLevels')]
+        schema += [census2011_common.provinceCodes, census2011_common.cityRanges]
+        schema += [fileHash( os.path.join( scriptDir, name )) for name in [topicScripts[topic]] + outputCode]
+        _fingerprints[topic] = hashlib.sha1( repr( schema )).hexdigest()
+    return _fingerprints[topic]
+
+
+def describeJob( job, options ):
+    # what a job's outputs depend on
+    return {'inputs':dict( [(name, fileHash( name )) for name in job['inputs']] ),
+            'schema':schemaFingerprint( job['topic'] ),
+            'options':options}
+
+
+def isUpToDate( record, description ):
+    if (record is None) or (record['build'] != description):
+        return False
+    for name, digest in record['outputs'].items():
+        if (not os.path.isfile( name )) or (fileHash( name ) != digest):
+            return False
+    return True
+
+
+def jobOptions( job, options ):
+    # options for one job's script: a --rejects or --metrics=FILE file
+    # would be written by every job at once, so each job gets its own
+    # <stub>_rejects.csv or <stub>_metrics.json (kept with its outputs)
+    jobOptions = []
+    for option in options:
+        name = option[2:].partition( '=' )[0]
+        if (name in jobFiles) and ((name == 'rejects') or ('=' in option)):
+            option = '--%s=%s%s' % (name, job['stub'], jobFiles[name])
+        jobOptions.append( option )
+    return jobOptions
+
+
+def jobOutputs( job, since ):
+    # files <stub>_* written since a job started
+    return [name for name in glob.glob( job['stub'] + '_*' )
+            if os.path.getmtime( name ) >= since and not name.endswith( '.log' )]
+
+
+def readBuildFile( fileName ):
+    if os.path.isfile( fileName ):
+        return json.load( open( fileName ))
+    return {}
+
+
+def writeBuildFile( fileName, builds ):
+    f = open( fileName + '.tmp', 'w' )
+    json.dump( builds, f, indent=1, sort_keys=True )
+    f.close()
+    os.rename( fileName + '.tmp', fileName )
+
+
+def runJob( job, options ):
+    # runs one topic script, its console output going to <stub>.log
+    command = [sys.executable, os.path.join( scriptDir, topicScripts[job['topic']] )] \
+            + job['inputs'] + [job['stub']] + jobOptions( job, options )
+    start = time.time()
+    try:
+        logFile = open( job['stub'] + '.log', 'w' )
+        try:
+            returnCode = subprocess.call( command, stdout=logFile, stderr=subprocess.STDOUT )
+        finally:
+            logFile.close()
+    except EnvironmentError as e:
+        print ">>runJob: %s: %s" % (job['stub'], e)
+        returnCode = -1
+    return job, returnCode, start, time.time() - start
+
+
+def runJobs( jobs, options, poolSize, builds, force=False ):
+    # runs the jobs that are out of date, updating builds (topic:stub -> record)
+    pool = ThreadPool( poolSize )
+    results = []
+    for job in jobs:
+        key = job['topic'] + ':' + job['stub']
+        description = describeJob( job, options )
+        if (not force) and isUpToDate( builds.get( key ), description ):
+            print ">>%-10s %-30s up to date" % (job['topic'], job['stub'])
+        else:
+            builds.pop( key, None )
+            results.append( (key, description, pool.apply_async( runJob, (job, options) )) )
+    pool.close()
+    failed = 0
+    for key, description, result in results:
+        job, returnCode, start, wallTime = result.get()
+        if returnCode == 0:
+            outputs = jobOutputs( job, start - 1 )
+            builds[key] = {'build':description,
+                           'outputs':dict( [(name, fileHash( name )) for name in outputs] )}
+            print ">>%-10s %-30s ok      %8.1fs" % (job['topic'], job['stub'], wallTime)
+        else:
+            failed += 1
+            print ">>%-10s %-30s FAILED  %8.1fs  (exit %d, see %s.log)" % (job['topic'], job['stub'], wallTime, returnCode, job['stub'])
+    pool.join()
+    return failed
+
+
+def getCommandLine():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    options = [a for a in sys.argv[1:] if a.startswith('--')]
+    if (len(args) ==1):
+        if os.path.isfile( args[0] ) :
+            return args[0],options
+    return "",options
+
+
+def printUsage():
+    print "Usage:"
+    print "python " + sys.argv[0] + " <MANIFEST.csv> [--jobs=N] [--force] [topic options]\n"
+    print "  --jobs=N   run at most N scripts at once (default: number of cores)"
+    print "  --force    rebuild every job, even if it is up to date"
+    print "  --build-file=FILE   where build records are kept (default: <MANIFEST.csv>.build.json)"
+    print "  any other option (--stream, --provinces=..) is passed to every script;"
+    print "      --rejects and --metrics=FILE write <OUTPUTSTUB>_rejects.csv and"
+    print "      <OUTPUTSTUB>_metrics.json for each job, --sqlite is not supported\n"
+
+
+if __name__ == "__main__":
+    print "Format Census 2011: batch"
+
+    manifestFileName,options = getCommandLine()
+    if (not manifestFileName) :
+        printUsage()
+        sys.exit(1)
+
+    jobs, errors = readManifest( open( manifestFileName ))
+    if errors:
+        for error in errors:
+            print ">>readManifest: " + error
+        sys.exit(1)
+
+    if getOption( options, 'sqlite' ):
+        print ">>--sqlite: every job would write the one database at once; run the scripts on their own"
+        sys.exit(1)
+
+    poolSize = int( getOption( options, 'jobs', multiprocessing.cpu_count() ))
+    buildFileName = getOption( options, 'build-file', manifestFileName + '.build.json' )
+    batchOptions = ('jobs', 'force', 'build-file')
+    scriptOptions = [o for o in options if o[2:].partition( '=' )[0] not in batchOptions]
+    print "Running %d job(s), %d at a time" % (len(jobs), poolSize)
+
+    start = time.time()
+    builds = readBuildFile( buildFileName )
+    failed = runJobs( jobs, scriptOptions, poolSize, builds, '--force' in options )
+    writeBuildFile( buildFileName, builds )
+    print "Done in %.1fs, %d of %d job(s) failed" % (time.time() - start, failed, len(jobs))
+    sys.exit( 1 if failed else 0 )
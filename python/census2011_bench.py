@@ -0,0 +1,166 @@
+###########################################################
+# census2011_bench.py
+#
+# Time the topic scripts of a manifest (e.g. the one
+# census2011_synth.py writes) stage by stage:
+#   parse    getDictionaryFromCSV on every input
+#   output   outputRecord and flush for all of the records
+#   process  processCensus end to end
+# Each stage runs in a process of its own, so its peak
+# memory (ru_maxrss) is its own.  Rates are input rows per
+# second for parse and process, records per second for
+# output.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import sys
+import os
+import imp
+import json
+import time
+import shutil
+import resource
+import tempfile
+import subprocess
+
+from census2011_common import getOption, openInput, createPool, closePool
+from census2011_batch import scriptDir, topicScripts, readManifest
+
+
+stages = ('parse', 'output', 'process')
+resultMarker = 'BENCH '
+
+
+def loadTopic( topic, options ):
+    # the TopicScript of the topic, set up the way its main() would with options
+    module = imp.load_source( 'census2011_bench_' + topic, os.path.join( scriptDir, topicScripts[topic] ))
+    module.script.configure( options )
+    return module.script
+
+
+def countRows( inputNames ):
+    # data rows of the inputs (lines after the header)
+    rows = 0
+    for name in inputNames:
+        f = openInput( name )
+        rows += sum( [1 for line in f] ) - 1
+        f.close()
+    return rows
+
+
+def runStage( stage, topic, inputNames, options ):
+    # one stage in this process: (rows, seconds)
+    script = loadTopic( topic, options )
+    workers = int( getOption( options, 'workers', 1 ))
+    outputDir = tempfile.mkdtemp( prefix='census2011_bench' )
+    if script.sqliteFile:  # timed the same, but not written over the one given
+        script.sqliteFile = os.path.join( outputDir, topic + '.sqlite' )
+    try:
+        if stage == 'parse':
+            pool = createPool( workers )
+            try:
+                start = time.time()
+                for name in inputNames:
+                    script.getDictionaryFromCSV( openInput( name ), pool )
+                seconds = time.time() - start
+            finally:
+                closePool( pool )
+            return countRows( inputNames ), seconds
+        if stage == 'output':
+            records = list( script.iterRecords( [openInput( name ) for name in inputNames] ))
+            outputFiles = script.createOutputFiles( os.path.join( outputDir, topic ))
+            start = time.time()
+            for record in records:
+                script.outputRecord( record, outputFiles )
+            outputFiles.flush()
+            return len( records ), time.time() - start
+        inputFiles = [openInput( name ) for name in inputNames]
+        outputFiles = script.createOutputFiles( os.path.join( outputDir, topic ))
+        script.writeHeader( outputFiles.files )
+        start = time.time()
+        script.processCensus( inputFiles, outputFiles, '--stream' in options, workers )
+        script.closeFiles( inputFiles )
+        outputFiles.close()
+        seconds = time.time() - start
+        return countRows( inputNames ), seconds
+    finally:
+        shutil.rmtree( outputDir )
+
+
+def benchStage( stage, job, options ):
+    # runs one stage in a child process: {'rows':, 'seconds':, 'peakMB':}
+    command = [sys.executable, os.path.abspath( __file__ ), '--stage=' + stage, job['topic']] \
+            + job['inputs'] + options
+    child = subprocess.Popen( command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT )
+    output = child.communicate()[0]
+    for line in output.splitlines():
+        if line.startswith( resultMarker ):
+            return json.loads( line[len(resultMarker):] )
+    print ">>benchStage: %s %s failed:\n%s" % (job['topic'], stage, output)
+    return None
+
+
+def printResult( topic, stage, result ):
+    if result is None:
+        print "%-10s %-8s %10s" % (topic, stage, 'FAILED')
+        return
+    rate = result['rows'] / result['seconds'] if result['seconds'] else 0
+    print "%-10s %-8s %10d %9.2fs %12.0f %9.1f" % (topic, stage, result['rows'], result['seconds'],
+            rate, result['peakMB'])
+
+
+def getCommandLine():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    options = [a for a in sys.argv[1:] if a.startswith('--')]
+    if getOption( options, 'stage' ):
+        return args,options
+    if (len(args) ==1):
+        if os.path.isfile( args[0] ) :
+            return args,options
+    return [],options
+
+
+def printUsage():
+    print "Usage:"
+    print "python " + sys.argv[0] + " <MANIFEST.csv> [--stages=parse,output,process] [--repeat=N] [topic options]\n"
+    print "  --stages=..   stages to time (default all)"
+    print "  --repeat=N    run each stage N times and keep the fastest (default 1)"
+    print "  the topic script options (--provinces=, --numpy, --workers=N, --stream, --cache=, --compress=,"
+    print "  --sqlite=, --sort-output, --pipeline) are used as the topic scripts use them; outputs go to"
+    print "  a temporary directory\n"
+
+
+if __name__ == "__main__":
+    args,options = getCommandLine()
+    stage = getOption( options, 'stage' )
+    if stage:
+        # child: one stage of one topic
+        options = [o for o in options if not o.startswith( '--stage=' )]
+        rows, seconds = runStage( stage, args[0], args[1:], options )
+        peakMB = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024.0
+        print resultMarker + json.dumps( {'rows':rows, 'seconds':seconds, 'peakMB':peakMB} )
+        sys.exit(0)
+
+    print "Format Census 2011: benchmark"
+    if (not args) :
+        printUsage()
+        sys.exit(1)
+
+    jobs, errors = readManifest( open( args[0] ))
+    if errors:
+        for error in errors:
+            print ">>readManifest: " + error
+        sys.exit(1)
+
+    selected = getOption( options, 'stages', ','.join( stages )).split( ',' )
+    repeat = int( getOption( options, 'repeat', 1 ))
+    topicOptions = [o for o in options if o[2:].partition( '=' )[0] not in ('stages', 'repeat')]
+
+    print "%-10s %-8s %10s %10s %12s %9s" % ('topic', 'stage', 'rows', 'time', 'rows/s', 'peak MB')
+    for job in jobs:
+        for stage in [s for s in stages if s in selected]:
+            results = [benchStage( stage, job, topicOptions ) for n in range(0, repeat)]
+            results = [r for r in results if r is not None]
+            printResult( job['topic'], stage, min( results, key=lambda r: r['seconds'] ) if results else None )
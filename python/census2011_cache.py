@@ -0,0 +1,116 @@
+###########################################################
+# census2011_cache.py
+#
+# Cache of parsed census inputs.  The accepted rows of an
+# input (what getDictionaryFromCSV builds) are saved with
+# marshal under a key made from the input's content hash and
+# the script's schema, so a rerun on the same file skips the
+# CSV parse.  The rows rejected while parsing are kept with
+# them (their counts, and the rows themselves when --rejects
+# was writing a file) and reported again on a cache hit; an
+# entry without the rows is parsed again when a rerun wants
+# them.  The least recently used entries are removed
+# once the cache grows past its size limit.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import sys
+import os
+import marshal
+import hashlib
+
+from census2011_common import rejects
+
+
+suffix = '.rows'
+
+
+def fileHash( fileName ):
+    h = hashlib.sha1()
+    f = open( fileName, 'rb' )
+    block = f.read( 1 << 20 )
+    while block:
+        h.update( block )
+        block = f.read( 1 << 20 )
+    f.close()
+    return h.hexdigest()
+
+
+def cacheKey( fileName, schema ):
+    # schema: anything with a stable repr() that decides which rows are
+    # kept and how (script name, dataColumns, provinces ...)
+    h = hashlib.sha1()
+    h.update( fileHash( fileName ))
+    h.update( repr( schema ))
+    h.update( repr( sys.version_info[:2] ))  # marshal format
+    return h.hexdigest()
+
+
+def loadRows( cacheDir, key ):
+    # the cached ([(rowId, row), ...], reject counts, reject rows or None)
+    # for key, or None
+    path = os.path.join( cacheDir, key + suffix )
+    try:
+        f = open( path, 'rb' )
+    except IOError:
+        return None
+    try:
+        ids, rows, counts, rejectRows = marshal.load( f )
+    except (EOFError, ValueError, TypeError):
+        return None
+    finally:
+        f.close()
+    os.utime( path, None )  # mark as recently used
+    return zip( ids, rows ), dict( counts ), rejectRows
+
+
+def saveRows( cacheDir, key, rows, rejected, maxBytes ):
+    # rejected: (reject counts, reject rows or None) of the parse
+    if not os.path.isdir( cacheDir ):
+        os.makedirs( cacheDir )
+    path = os.path.join( cacheDir, key + suffix )
+    tmpPath = path + '.tmp%d' % os.getpid()
+    f = open( tmpPath, 'wb' )
+    counts, rejectRows = rejected
+    marshal.dump( ([rowId for rowId, row in rows], [row for rowId, row in rows],
+                   counts.items(), rejectRows), f, 2 )
+    f.close()
+    os.rename( tmpPath, path )
+    evict( cacheDir, maxBytes )
+
+
+def evict( cacheDir, maxBytes ):
+    # removes the least recently used entries until the cache fits in maxBytes
+    entries = []
+    for name in os.listdir( cacheDir ):
+        if name.endswith( suffix ):
+            path = os.path.join( cacheDir, name )
+            st = os.stat( path )
+            entries.append( (st.st_mtime, st.st_size, path) )
+    entries.sort()
+    total = sum( [size for mtime, size, path in entries] )
+    while entries and (total > maxBytes):
+        mtime, size, path = entries.pop( 0 )
+        print ">>evict - removing: " + path
+        os.remove( path )
+        total -= size
+
+
+def cachedRows( cacheDir, maxBytes, fileName, schema, read ):
+    # the rows of fileName from the cache, or from read() (then cached)
+    key = cacheKey( fileName, schema )
+    entry = loadRows( cacheDir, key )
+    if (entry is not None) and ((entry[2] is not None) or not rejects.keepRows):
+        print ">>cachedRows - using cached rows for " + fileName
+        rows, counts, rejectRows = entry
+        rejects.replay( counts, rejectRows )
+        return rows
+    rejects.capture()
+    try:
+        rows = list( read() )
+    finally:
+        rejected = rejects.endCapture()
+    saveRows( cacheDir, key, rows, rejected, maxBytes )
+    return rows
@@ -0,0 +1,104 @@
+###########################################################
+# census2011_columnar.py
+#
+# Optional NumPy engine for the census2011_* scripts: the
+# age totals check and TOTALPOP sum and the roll-up sums done
+# on whole batches of rows at once instead of cell by cell.
+# Cells are numbers, strings of numbers or None (suppressed,
+# taken as nan).
+# Everything here needs numpy; check available() first.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+batchSize = 8192
+
+
+def available():
+    return numpy is not None
+
+
+def batches( iterable, size=batchSize ):
+    # lists of up to size items from iterable
+    batch = []
+    for item in iterable:
+        batch.append( item )
+        if len( batch ) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def toFloat( cell ):
+    try:
+        return float( cell )
+    except ValueError:
+        return numpy.nan
+
+
+def numericColumns( rows, first, last=None ):
+    # rows[:][first:last] as a 2D float array, with a mask of the rows in
+    # which every cell is a valid number (float() accepts it) or None
+    cells = [row[first:last] for row in rows]
+    if not cells:
+        return numpy.zeros( (0, 0) ), numpy.zeros( 0, dtype=bool )
+    try:
+        values = numpy.array( cells, dtype=float )
+        valid = numpy.ones( len(cells), dtype=bool )
+    except ValueError:
+        values = numpy.array( [[toFloat( c ) for c in row] for row in cells], dtype=float )
+        valid = numpy.array( [all( [_isNumber( c ) for c in row] ) for row in cells], dtype=bool )
+    return values.reshape( len(cells), -1 ), valid
+
+
+def _isNumber( cell ):
+    try:
+        float( cell )
+        return True
+    except ValueError:
+        return False
+
+
+def validTotals( rows, tolerance=50 ):
+    # mask of rows [name, total, part, part, ...] where every cell is a
+    # number and the truncated parts add up to the truncated total within
+    # tolerance, i.e. abs( int(float(total)) - sum(int(float(part))) ) < tolerance;
+    # a row with a None cell is not in it
+    values, valid = numericColumns( rows, 1 )
+    if not len( values ):
+        return valid
+    counts = numpy.trunc( values )
+    with numpy.errstate( invalid='ignore' ):
+        close = numpy.abs( counts[:,0] - counts[:,1:].sum( axis=1 )) < tolerance
+    return valid & close
+
+
+def sumColumns( cellsA, cellsB ):
+    # int( float(a) + float(b) ) for each pair of cells, as a list of ints,
+    # None where a or b is None
+    total = numpy.array( cellsA, dtype=float ) + numpy.array( cellsB, dtype=float )
+    return [None if t != t else int( t ) for t in total.tolist()]
+
+
+def groupSums( keys, rows ):
+    # column sums of rows (lists of cells) grouped by key, in one pass:
+    # (the distinct keys in order, a list of sums for each, a list of the
+    # number of cells in each sum that are not numbers); a cell that is
+    # not a number (suppressed) is left out of its sum and counted instead
+    values, valid = numericColumns( rows, 0 )
+    missing = numpy.isnan( values )
+    values[missing] = 0.0
+    keys = numpy.asarray( keys )
+    order = numpy.argsort( keys, kind='mergesort' )
+    keys = keys[order]
+    starts = numpy.flatnonzero( numpy.r_[True, keys[1:] != keys[:-1]] )
+    return keys[starts].tolist(), numpy.add.reduceat( values[order], starts, axis=0 ).tolist(), \
+            numpy.add.reduceat( missing[order].astype( int ), starts, axis=0 ).tolist()
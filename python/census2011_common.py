@@ -0,0 +1,1098 @@
+###########################################################
+# census2011_common.py
+#
+# Helpers shared by the census2011_* topic scripts, and
+# TopicScript, the driver each of them runs.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import sys
+import os
+import io
+import imp
+import csv
+import gzip
+import bz2
+import marshal
+import mmap
+import sqlite3
+import threading
+import multiprocessing
+from cStringIO import StringIO
+
+from census2011_metrics import metrics
+import census2011_columnar as columnar
+import census2011_pipeline
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+provinceCodes = {
+        'NL':10, 'PE':11, 'NS':12, 'NB':13, 'QC':24, 'ON':35, 'MB':46,
+        'SK':47, 'AB':48, 'BC':59, 'YT':60, 'NT':61, 'NU':62 }
+# CMA/CA codes (the CITY level) of each province, exclusive bounds.
+# Newfoundland's 001-015 read as 1-2 digit UIDs and cannot be told
+# apart from province rows, and Nunavut has none.
+cityRanges = {
+        'PE':(100,200), 'NS':(200,300), 'NB':(300,400), 'QC':(400,500),
+        'ON':(500,600), 'MB':(600,700), 'SK':(700,800), 'AB':(800,900),
+        'BC':(900,980), 'YT':(989,991), 'NT':(994,996) }
+# The level each level's codes nest in, and the length of its UID: a CSD
+# or DA code starts with its CD's, a CD code with its province's.  DA codes
+# do not hold their CSD, so CSD to DA goes through the CD.
+parentLevels = {'CD':('PR', 2), 'CSD':('CD', 4), 'DA':('CD', 4)}
+
+
+compressionSuffixes = ('gz', 'bz2', 'xz')
+
+
+def compression( fileName ):
+    # 'gz', 'bz2' or 'xz' if fileName is compressed, else None
+    suffix = os.path.splitext( fileName )[1][1:]
+    if suffix in compressionSuffixes:
+        return suffix
+    return None
+
+
+class CompressedFile(object):
+    # A compressed file opened by openInput or openOutput: a stream through
+    # the compressor's file object that also has the file's name.
+
+    def __init__( self, stream, name ):
+        self.stream = stream
+        self.name = name
+
+    def __iter__( self ):
+        return iter( self.stream )
+
+    def __getattr__( self, attr ):
+        return getattr( self.stream, attr )
+
+    def flush( self ):
+        # bz2.BZ2File has no flush(); its data is written on close()
+        if hasattr( self.stream, 'flush' ):
+            self.stream.flush()
+
+
+def openCompressed( fileName, mode, level=None ):
+    kind = compression( fileName )
+    if kind == 'xz' and lzma is None:
+        raise IOError( "reading or writing %s needs the lzma module (backports.lzma on Python 2)" % fileName )
+    if kind == 'gz':
+        return gzip.GzipFile( fileName, mode, 9 if level is None else level )
+    if kind == 'bz2':
+        return bz2.BZ2File( fileName, mode, compresslevel=9 if level is None else level )
+    if 'w' in mode:
+        return lzma.LZMAFile( fileName, mode, preset=level )
+    return lzma.LZMAFile( fileName, mode )
+
+
+def openInput( fileName, bufferSize=1 << 20 ):
+    # fileName for reading, decompressed on the fly if it ends in .gz, .bz2 or .xz
+    if not compression( fileName ):
+        return open( fileName )
+    stream = openCompressed( fileName, 'rb' )
+    if isinstance( stream, gzip.GzipFile ):
+        stream = io.BufferedReader( stream, bufferSize )  # GzipFile lines are slow
+    return CompressedFile( stream, fileName )
+
+
+def openOutput( fileName, level=None, bufferSize=1 << 20 ):
+    # fileName for writing, compressed on the fly (at level, 1-9) if it
+    # ends in .gz, .bz2 or .xz
+    if not compression( fileName ):
+        return open( fileName, 'wb', bufferSize )
+    return CompressedFile( openCompressed( fileName, 'wb', level ), fileName )
+
+
+def getOption( options, name, default=None ):
+    # value of --name=value in a list of command line options, True for a
+    # bare --name, default if it is not there
+    for option in options:
+        key, sep, value = option[2:].partition( '=' )
+        if key == name:
+            return value if sep else True
+    return default
+
+
+# The types of the dataDictionary columns (the third item of an entry):
+#   id       the UID
+#   text     GEOGRAPHY
+#   count    a whole number of people, households, ...; adds up from DAs
+#            to their parents
+#   rate     a percentage or other ratio (PARTICRATE, AVGPERS): an int
+#            when whole (65 is written back as 65, not 65.0), else a float
+#   dollars  a median or average amount (TMEDIAN, TAVERAGE): an int for
+#            whole dollars, else a float
+# Number cells that StatsCan suppressed or did not publish hold one of
+# suppressedCells; they become None (an empty output cell) instead of
+# the row being rejected.
+suppressedCells = frozenset( ['', 'x', 'X', '..', '...', 'F'] )
+
+
+def isSuppressed( cell ):
+    return (cell is None) or (cell.strip() in suppressedCells)
+
+
+def toCount( cell ):
+    try:
+        return int( cell )
+    except (ValueError, TypeError):
+        if isSuppressed( cell ):
+            return None
+        return int( float( cell ))  # 12.0; ValueError for text
+
+
+def toRate( cell ):
+    try:
+        return int( cell )
+    except (ValueError, TypeError):
+        if isSuppressed( cell ):
+            return None
+        value = float( cell )  # ValueError for text
+        return int( value ) if value.is_integer() else value
+
+
+def toDollars( cell ):
+    try:
+        return int( cell )
+    except (ValueError, TypeError):
+        if isSuppressed( cell ):
+            return None
+        value = float( cell )
+        return int( value ) if value == int( value ) else value
+
+
+def toText( cell ):
+    return cell
+
+
+cellConverters = {'id':int, 'text':toText, 'count':toCount, 'rate':toRate, 'dollars':toDollars}
+# the builtin that converts a whole run of cells of a type in the usual case
+fastConverters = {'id':int, 'count':int, 'rate':int, 'dollars':int}
+
+
+class RowConverter(object):
+    # Converts rows of cells of the given types (see cellConverters) to
+    # typed values.  Each run of columns of one type is done with one
+    # map() of int or float; a run with a cell that is suppressed or
+    # written another way (12.0) goes cell by cell.  ValueError for a cell
+    # that is not a number, or suppressed, in a number column.
+
+    def __init__( self, types ):
+        self.types = list( types )
+        self.runs = []  # (start, end, builtin or None, converter)
+        start = 0
+        for n in range(1, len(types) + 1):
+            if (n == len(types)) or (types[n] != types[start]):
+                self.runs.append( (start, n, fastConverters.get( types[start] ), cellConverters[types[start]]) )
+                start = n
+
+    def __call__( self, cells ):
+        values = []
+        for start, end, fast, convert in self.runs:
+            run = cells[start:end]
+            if fast is None:
+                values += run
+                continue
+            try:
+                values += map( fast, run )
+            except (ValueError, TypeError):
+                values += map( convert, run )
+        return values
+
+
+def parseGeographyUID( geography ):
+    # return the digits of the first "(1234)" in a Geography cell, or None
+    # (same match as re.search(r"\((\d+)\)"), without the regex engine)
+    start = geography.find( '(' )
+    while start != -1:
+        end = geography.find( ')', start )
+        if end == -1:
+            return None
+        digits = geography[start+1:end]
+        if digits.isdigit():
+            return digits
+        start = geography.find( '(', start + 1 )
+    return None
+
+
+class GeoRouter(object):
+    # Maps a UID to its index in geoLevels.  A UID belongs to the first
+    # level with id < 10 ** codeLength, i.e. the first level whose
+    # codeLength is at least the number of digits in the UID, so the
+    # answer for every digit count is worked out once up front.
+
+    def __init__( self, geoLevels ):
+        self.geoLevels = geoLevels
+        maxLength = max( [level['codeLength'] for level in geoLevels] )
+        self.byDigits = [None] * (maxLength + 1)
+        for digits in range(1, maxLength + 1):
+            for i in range(0, len(geoLevels)):
+                if digits <= geoLevels[i]['codeLength']:
+                    self.byDigits[digits] = i
+                    break
+
+    def levelIndex( self, id ):
+        digits = len( str(id) )
+        if digits < len( self.byDigits ):
+            return self.byDigits[digits]
+        return None
+
+    def levelCode( self, id ):
+        i = self.levelIndex( id )
+        if i is None:
+            return None
+        return self.geoLevels[i]['code']
+
+
+class ProvinceSelection(object):
+    # The provinces a run writes output for.  With sharded set every
+    # province gets its own <stub>_<PROV>_<LEVEL>.csv files, otherwise the
+    # (single) province goes to <stub>_<LEVEL>.csv.
+
+    def __init__( self, names, sharded=False ):
+        for name in names:
+            if name not in provinceCodes:
+                raise ValueError( "unknown province: " + name )
+        self.names = names
+        self.sharded = sharded
+        self.prefixes = dict( [('%d' % provinceCodes[n], n) for n in names] )
+        self.codes = dict( [(provinceCodes[n], n) for n in names] )
+        self.cities = [(cityRanges[n], n) for n in names if n in cityRanges]
+
+    def prefixProvince( self, uid ):
+        # province of a UID digit string by its first two digits
+        return self.prefixes.get( uid[0:2] )
+
+    def cityProvince( self, id ):
+        # province of a province row or of a city in its CMA/CA range
+        if id in self.codes:
+            return self.codes[id]
+        for (low, high), name in self.cities:
+            if low < id < high:
+                return name
+        return None
+
+    def prefixMarkers( self ):
+        # raw-line prefilter for UIDs starting with a province code
+        return ['(' + prefix for prefix in self.prefixes]
+
+    def cityMarkers( self ):
+        # raw-line prefilter for province rows and city codes
+        markers = ['(%d)' % code for code in self.codes]
+        for (low, high), name in self.cities:
+            marker = '(%d' % ((low + 1) // 100)
+            if marker not in markers:
+                markers.append( marker )
+        return markers
+
+    def fileName( self, stub, name, code ):
+        if self.sharded:
+            return stub + '_' + name + '_' + code + '.csv'
+        return stub + '_' + code + '.csv'
+
+
+def selectProvinces( option ):
+    # --provinces=BC,AB (sharded output); without it BC only, as before
+    if option is None:
+        return ProvinceSelection( ['BC'] )
+    return ProvinceSelection( [name.strip().upper() for name in option.split( ',' )], True )
+
+
+class OutputSet(object):
+    # The output files of a run, one per selected province and geo level,
+    # with rows routed to them by UID.  Rows are held per file and written
+    # batchSize at a time through csv.writer (which quotes names with commas)
+    # as one block into files with bufferSize buffers; flush() before
+    # closing the files.  With compress (see openOutput) the files are
+    # compressed as they are written.
+
+    def __init__( self, stub, geoLevels, provinces, batchSize=4096, bufferSize=1 << 20,
+                  compress=None, level=None ):
+        if compress and (compress not in compressionSuffixes):
+            raise ValueError( "unknown compression %s, use one of %s" % (compress, ', '.join( compressionSuffixes )) )
+        self.router = GeoRouter( geoLevels )
+        self.batchSize = batchSize
+        self.files = []
+        self.byKey = {}
+        self.pending = {}
+        for name in provinces.names:
+            for i in range(0, len(geoLevels)):
+                newFile = provinces.fileName( stub, name, geoLevels[i]['code'] )
+                if compress:
+                    newFile += '.' + compress
+                print ">>createOutputFiles - creating: " + newFile
+                f = openOutput( newFile, level, bufferSize )
+                self.files.append( f )
+                self.byKey[ (name, i) ] = f
+                self.pending[ (name, i) ] = []
+        self.writeRow = metrics.timedCall( 'write', self.writeRow )
+
+    def keyFor( self, province, id ):
+        i = self.router.levelIndex( id )
+        if (i is None) or ((province, i) not in self.byKey):
+            return None
+        return (province, i)
+
+    def fileFor( self, province, id ):
+        key = self.keyFor( province, id )
+        return self.byKey[key] if key else None
+
+    def writeRow( self, province, id, row ):
+        # queues row for the file of province and id; False if there is none
+        key = self.keyFor( province, id )
+        if not key:
+            rejects.add( 'write', 'no output file', row, id )
+            return False
+        pending = self.pending[key]
+        pending.append( row )
+        if len( pending ) >= self.batchSize:
+            self.writeBatch( key )
+        return True
+
+    def writeBatch( self, key ):
+        block = StringIO()
+        csv.writer( block, lineterminator='\n' ).writerows( self.pending[key] )
+        self.byKey[key].write( block.getvalue() )
+        metrics.add( 'write', 'rowsOut', len( self.pending[key] ))
+        metrics.add( 'write', 'bytes', block.tell() )
+        del self.pending[key][:]
+
+    def flush( self ):
+        for key, pending in self.pending.items():
+            if pending:
+                self.writeBatch( key )
+        for f in self.files:
+            f.flush()
+
+    def close( self ):
+        self.flush()
+        for f in self.files:
+            print ">>closeFiles - closing:" + f.name
+            f.close()
+
+
+class SqliteOutputSet(OutputSet):
+    # OutputSet that writes each province and geo level to a table of a
+    # SQLite file instead, named like the CSV file would be (age_DA,
+    # age_BC_DA, ...).  Columns are columnHeaders plus PARENTUID, the UID
+    # of the geography the row's code nests in (see parentLevels).  Rows
+    # go in with executemany, batchSize at a time, in one transaction; the
+    # UID and PARENTUID indexes are built by close(), after loading.
+
+    def __init__( self, fileName, stub, geoLevels, provinces, columnHeaders, batchSize=20000 ):
+        self.router = GeoRouter( geoLevels )
+        self.batchSize = batchSize
+        self.files = []
+        self.byKey = {}
+        self.pending = {}
+        self.fileName = fileName
+        self.parentLength = {}
+        print ">>createOutputFiles - writing tables to: " + fileName
+        self.db = sqlite3.connect( fileName, check_same_thread=False )  # --pipeline writes in a thread
+        self.db.text_factory = str
+        self.db.execute( 'PRAGMA synchronous=OFF' )
+        self.db.execute( 'PRAGMA journal_mode=MEMORY' )
+        columns = ['"UID" INTEGER', '"GEOGRAPHY" TEXT'] + ['"%s" NUMERIC' % c for c in columnHeaders[2:]]
+        for name in provinces.names:
+            for i in range(0, len(geoLevels)):
+                code = geoLevels[i]['code']
+                table = os.path.basename( provinces.fileName( stub, name, code ))[:-len('.csv')]
+                table = ''.join( [c if c.isalnum() else '_' for c in table] )
+                print ">>createOutputFiles - creating table: " + table
+                self.db.execute( 'DROP TABLE IF EXISTS "%s"' % table )
+                self.db.execute( 'CREATE TABLE "%s" (%s, "PARENTUID" INTEGER)' % (table, ', '.join( columns )) )
+                self.byKey[ (name, i) ] = table
+                self.pending[ (name, i) ] = []
+                self.parentLength[ (name, i) ] = parentLevels.get( code, (None, None) )[1]
+        self.insert = dict( [(key, 'INSERT INTO "%s" VALUES (%s)' % (table, ','.join( ['?'] * (len(columns) + 1) )))
+                             for key, table in self.byKey.items()] )
+        self.writeRow = metrics.timedCall( 'write', self.writeRow )
+
+    def writeBatch( self, key ):
+        length = self.parentLength[key]
+        if length:
+            rows = [list( row ) + [int( str( row[0] )[:length] )] for row in self.pending[key]]
+        else:
+            rows = [list( row ) + [None] for row in self.pending[key]]
+        self.db.executemany( self.insert[key], rows )
+        metrics.add( 'write', 'rowsOut', len( rows ))
+        del self.pending[key][:]
+
+    def flush( self ):
+        OutputSet.flush( self )
+        self.db.commit()
+
+    def close( self ):
+        self.flush()
+        for table in sorted( self.byKey.values() ):
+            print ">>close - indexing table: " + table
+            self.db.execute( 'CREATE INDEX "%s_UID" ON "%s" ("UID")' % (table, table) )
+            self.db.execute( 'CREATE INDEX "%s_PARENTUID" ON "%s" ("PARENTUID")' % (table, table) )
+        self.db.commit()
+        print ">>closeFiles - closing:" + self.fileName
+        self.db.close()
+
+
+class RejectSink(object):
+    # Rows dropped (or, for a missing age side, filled in) and why.  Every
+    # reject is counted by stage and reason, here and in metrics; with a
+    # file open the rows are also written there, batchSize at a time, as
+    #   STAGE,REASON,UID,<the row's cells>
+    # Worker processes keep their rows until snapshot() hands them back.
+    # add() and flush() take a lock, for the --pipeline writer thread.
+    # Between capture() and endCapture() the counts and rows added are
+    # also kept aside, for the input cache to replay() on a rerun.
+
+    def __init__( self, batchSize=4096 ):
+        self.batchSize = batchSize
+        self.lock = threading.Lock()
+        self.file = None
+        self.owner = None  # pid of the process that writes the file
+        self.keepRows = False
+        self.pending = []
+        self.counts = {}
+        self.captured = None
+
+    def open( self, fileName ):
+        print ">>RejectSink - writing rejected rows to: " + fileName
+        self.file = openOutput( fileName )
+        self.file.write( 'STAGE,REASON,UID,VALUES\n' )
+        self.owner = os.getpid()
+        self.keepRows = True
+
+    def add( self, stage, reason, row, uid=None ):
+        with self.lock:
+            metrics.reject( stage, reason )
+            key = (stage, reason)
+            self.counts[key] = self.counts.get( key, 0 ) + 1
+            if self.captured is not None:
+                self.captured[0][key] = self.captured[0].get( key, 0 ) + 1
+            if self.keepRows:
+                if (uid is None) and row:
+                    uid = parseGeographyUID( str( row[0] ))
+                self.pending.append( [stage, reason, uid or ''] + list( row ))
+                if self.captured is not None:
+                    self.captured[1].append( self.pending[-1] )
+                if len( self.pending ) >= self.batchSize:
+                    self.writePending()
+
+    def flush( self ):
+        with self.lock:
+            self.writePending()
+
+    def writePending( self ):
+        if self.pending and (self.owner == os.getpid()):
+            block = StringIO()
+            csv.writer( block, lineterminator='\n' ).writerows( self.pending )
+            self.file.write( block.getvalue() )
+            del self.pending[:]
+
+    def snapshot( self ):
+        # counts and rows so far, cleared; for worker processes, which leave
+        # the file to the parent and keep their rows for it
+        counts, pending = self.counts, self.pending
+        self.counts, self.pending = {}, []
+        return counts, pending
+
+    def merge( self, counts, pending ):
+        for key, n in counts.items():
+            self.counts[key] = self.counts.get( key, 0 ) + n
+            if self.captured is not None:
+                self.captured[0][key] = self.captured[0].get( key, 0 ) + n
+        self.pending += pending
+        if self.captured is not None:
+            self.captured[1].extend( pending )
+        if len( self.pending ) >= self.batchSize:
+            self.flush()
+
+    def capture( self ):
+        self.captured = ({}, [])
+
+    def endCapture( self ):
+        # (counts, rows) added since capture(); rows is None when they were not kept
+        counts, rows = self.captured
+        self.captured = None
+        return counts, rows if self.keepRows else None
+
+    def replay( self, counts, rows ):
+        # the rejects of an endCapture() again, e.g. for rows read from the cache
+        for (stage, reason), n in counts.items():
+            metrics.reject( stage, reason, n )
+        self.merge( counts, rows if self.keepRows else [] )
+
+    def close( self ):
+        # writes what is left and prints the counts
+        for (stage, reason), n in sorted( self.counts.items() ):
+            print ">>rejected %d row(s): %s, %s" % (n, stage, reason)
+        if self.file is not None:
+            self.flush()
+            print ">>closeFiles - closing:" + self.file.name
+            self.file.close()
+            self.file = None
+
+
+rejects = RejectSink()
+
+
+class RecordStore(object):
+    # The parsed rows of an input by UID, in place of a dictionary of
+    # lists: store[uid] = row, store.get( uid ), uid in store, iteration
+    # over the UIDs and iteritems(), in dictionary order.  A list of n
+    # cells costs n pointers and n int, float or string objects; each
+    # row is kept instead as one marshal string of its cells, loaded
+    # again when it is read (a new list each time).
+
+    def __init__( self ):
+        self.rows = {}
+
+    def __setitem__( self, uid, row ):
+        self.rows[uid] = marshal.dumps( list( row ))
+
+    def unpack( self, packed ):
+        return marshal.loads( packed )
+
+    def get( self, uid, default=None ):
+        packed = self.rows.get( uid )
+        if packed is None:
+            return default
+        return self.unpack( packed )
+
+    def __getitem__( self, uid ):
+        return self.unpack( self.rows[uid] )
+
+    def __contains__( self, uid ):
+        return uid in self.rows
+
+    def __iter__( self ):
+        return iter( self.rows )
+
+    def __len__( self ):
+        return len( self.rows )
+
+    def iteritems( self ):
+        for uid, packed in self.rows.iteritems():
+            yield uid, self.unpack( packed )
+
+
+def readHeader( inputFile, headerRows=1 ):
+    # field names from the header row; with several header rows the
+    # names are the rows joined column by column with '.'
+    rows = []
+    for n in range(0, headerRows):
+        line = inputFile.readline()
+        while line.count( '"' ) % 2:
+            nextLine = inputFile.readline()
+            if not nextLine:
+                break
+            line += nextLine
+        rows.append( [field.strip() for field in csv.reader( line.splitlines(True) ).next()] )
+    return ['.'.join( names ) for names in zip( *rows )]
+
+
+def resolveColumns( fieldNames, columns ):
+    # positions of columns in fieldNames.  A name listed more than once in
+    # columns takes its next occurrence in the header each time (the income
+    # tables repeat "Under $5,000" etc. for persons and for families).
+    positions = {}
+    for i in range(0, len(fieldNames)):
+        positions.setdefault( fieldNames[i], [] ).append( i )
+    seen = {}
+    indexes = []
+    for name in columns:
+        if name not in positions:
+            raise KeyError( "column not found in header: " + name )
+        n = seen.get( name, 0 )
+        if n >= len( positions[name] ):
+            raise KeyError( "column listed %d times but found %d times in header: %s" % (n + 1, len( positions[name] ), name) )
+        indexes.append( positions[name][n] )
+        seen[name] = n + 1
+    return indexes
+
+
+class ProjectedReader(object):
+    # Reads the data rows of a census CSV as lists holding only the wanted
+    # columns, in the order given.  The header is resolved to positions
+    # once; a plain line is only split as far as the last wanted column and
+    # lines with quotes go through the csv module.
+    #
+    # inputFile can be any iterable of lines.  A plain file is read through
+    # mmap (see mappedLines) so lines the prefilter drops are never copied.
+    #
+    # prefilter is a list of strings of which a line must contain at least
+    # one (e.g. "(59" for UIDs in BC).  Lines without any are dropped before
+    # they are tokenized.  The test only has to be a necessary condition,
+    # so it is safe on quoted lines too; a line that opens a multi-line
+    # field is ambiguous and is always handed to the parser.
+    #
+    # A row that ends before the last wanted column is rejected (parse,
+    # short row) rather than padded: a missing cell is not a suppressed
+    # one, and padding would pass a truncated row off as a valid one.
+
+    def __init__( self, inputFile, columns, headerRows=1, prefilter=None, fieldNames=None ):
+        # with fieldNames given inputFile holds data rows only
+        self.inputFile = inputFile
+        self.fieldNames = fieldNames or readHeader( inputFile, headerRows )
+        self.indexes = resolveColumns( self.fieldNames, columns )
+        self.width = max( self.indexes ) + 1
+        self.prefilter = prefilter
+
+    def splitLine( self, line ):
+        if '"' in line:
+            return csv.reader( line.splitlines(True) ).next()
+        return line.rstrip( '\r\n' ).split( ',', self.width )
+
+    def accepts( self, line ):
+        for marker in self.prefilter:
+            if marker in line:
+                return True
+        return False
+
+    def __iter__( self ):
+        return iter( metrics.timedIter( 'parse', self.rows() ))
+
+    def rows( self ):
+        indexes = self.indexes
+        width = self.width
+        prefilter = self.prefilter
+        if prefilter and isinstance( self.inputFile, file ):
+            lines = metrics.timedIter( 'read', mappedLines( self.inputFile, prefilter ))
+        else:
+            lines = metrics.timedIter( 'read', self.inputFile, len )
+        lines = iter( lines )
+        for line in lines:
+            if line.count( '"' ) % 2:
+                while line.count( '"' ) % 2:
+                    nextLine = next( lines, '' )
+                    if not nextLine:
+                        break
+                    line += nextLine
+            elif prefilter and not self.accepts( line ):
+                continue
+            if not line.strip( '\r\n' ):
+                continue
+            fields = self.splitLine( line )
+            if len( fields ) < width:
+                rejects.add( 'parse', 'short row', fields )
+                continue
+            yield [fields[i] for i in indexes]
+
+
+def mappedLines( inputFile, markers ):
+    # The lines of inputFile from its current position, read through mmap.
+    # Only lines holding one of markers are sliced out of the map: the next
+    # hit of each marker is found with mmap.find() and the lines in between
+    # are skipped unread.  Lines with a quote, and the lines after one that
+    # opens a multi-line field, are always returned.
+    pos = inputFile.tell()
+    size = os.fstat( inputFile.fileno() ).st_size
+    if pos >= size:
+        return
+    mm = mmap.mmap( inputFile.fileno(), 0, access=mmap.ACCESS_READ )
+    metrics.add( 'read', 'bytes', size - pos )
+    try:
+        nextHit = dict( [(marker, -1) for marker in markers] )
+        nextQuote = -1
+        quoted = False  # inside a multi-line field
+        while pos < size:
+            if nextQuote < pos:
+                nextQuote = mm.find( '"', pos )
+                nextQuote = size if nextQuote < 0 else nextQuote
+            for marker, hit in nextHit.items():
+                if hit < pos:
+                    hit = mm.find( marker, pos )
+                    nextHit[marker] = size if hit < 0 else hit
+            hit = min( nextHit.values() )
+            lineStart = mm.rfind( '\n', pos, hit ) + 1 or pos
+            if quoted:
+                lineStart = pos
+            elif nextQuote < lineStart:
+                lineStart = mm.rfind( '\n', pos, nextQuote ) + 1 or pos
+            elif hit >= size:
+                break
+            end = mm.find( '\n', lineStart ) + 1 or size
+            line = mm[lineStart:end]
+            if line.count( '"' ) % 2:
+                quoted = not quoted
+            yield line
+            pos = end
+    finally:
+        mm.close()
+
+
+def splitRanges( fileName, start, chunkSize ):
+    # (start, end) byte ranges from start to the end of the file, each
+    # ending on a line boundary outside quotes.  The file is read through
+    # once counting quotes, so a range never ends inside a multi-line
+    # quoted field (a Geography with a footnote on its next line).
+    size = os.path.getsize( fileName )
+    ranges = []
+    f = open( fileName, 'rb' )
+    f.seek( start )
+    quoted = False
+    while start < size:
+        block = f.read( chunkSize )
+        quoted ^= block.count( '"' ) % 2 == 1
+        line = f.readline()  # the rest of the line the block ends in
+        quoted ^= line.count( '"' ) % 2 == 1
+        while quoted and line:  # on to the line that closes the field
+            line = f.readline()
+            quoted ^= line.count( '"' ) % 2 == 1
+        end = f.tell()
+        ranges.append( (start, end) )
+        start = end
+    f.close()
+    return ranges
+
+
+def readRange( fileName, start, end ):
+    # the lines of one byte range of a file
+    f = open( fileName, 'rb' )
+    f.seek( start )
+    data = f.read( end - start )
+    f.close()
+    return StringIO( data )
+
+
+def createPool( workers ):
+    # worker processes for parallelRows, None to parse serially.  Create it
+    # before anything starts threads (forking a second pool while a first
+    # one is running can deadlock its workers) and share it between inputs.
+    if workers > 1:
+        return multiprocessing.Pool( workers )
+    return None
+
+
+def closePool( pool ):
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+
+def measuredRange( parseRange, byteRange ):
+    # parseRange in a worker, with the worker's metrics and rejects for its range
+    metrics.snapshot()
+    rejects.snapshot()
+    rows = parseRange( byteRange )
+    return rows, metrics.snapshot(), rejects.snapshot()
+
+
+def parallelRows( inputFile, headerRows, parseRange, pool ):
+    # Rows of inputFile parsed by a pool of worker processes.  The body is
+    # cut into line-aligned byte ranges and each worker calls
+    # parseRange( (fileName, start, end, fieldNames) ), which returns the
+    # rows of its range.  Results come back in file order, so callers see
+    # exactly what a serial read would give them; only a few ranges per
+    # core are in flight at a time.  Ranges end outside quoted fields
+    # (see splitRanges), so fields with line breaks stay whole.
+    workers = multiprocessing.cpu_count()
+    fieldNames = readHeader( inputFile, headerRows )
+    start = inputFile.tell()
+    size = os.path.getsize( inputFile.name )
+    chunkSize = min( 16 << 20, max( 1 << 16, (size - start) // (workers * 4) + 1 ))
+    ranges = [(inputFile.name, s, e, fieldNames) for s, e in splitRanges( inputFile.name, start, chunkSize )]
+
+    pending = []
+    while ranges or pending:
+        while ranges and (len( pending ) < 2 * workers):
+            pending.append( pool.apply_async( measuredRange, (parseRange, ranges.pop( 0 )) ))
+        rows, stages, (counts, rejected) = pending.pop( 0 ).get()
+        metrics.merge( stages )
+        rejects.merge( counts, rejected )
+        for row in rows:
+            yield row
+
+
+runningScripts = {}  # TopicScripts by module name, for RangeParser
+parseCode = ['census2011_common.py', 'census2011_columnar.py']  # modules the cached rows depend on
+
+
+def sourceFile( fileName ):
+    # the .py of a module's __file__, which may be its .pyc
+    return os.path.splitext( fileName )[0] + '.py'
+
+
+class RangeParser(object):
+    # script.parseRange for parallelRows.  A bound method cannot be sent
+    # to a worker process, so this sends the name and file of the script's
+    # module and the options it was configured with.  A forked worker finds
+    # the script in runningScripts by the module name; a spawned one
+    # (Windows) imports the module again and configures its script the
+    # same way.
+
+    def __init__( self, script ):
+        self.moduleName = script.module.__name__
+        self.fileName = sourceFile( script.module.__file__ )
+        self.options = script.options
+        runningScripts[self.moduleName] = script
+
+    def script( self ):
+        script = runningScripts.get( self.moduleName )
+        if script is None:
+            module = sys.modules.get( self.moduleName )
+            if getattr( module, 'script', None ) is None:
+                module = imp.load_source( self.moduleName, self.fileName )
+            script = module.script
+            script.configure( self.options )
+            runningScripts[self.moduleName] = script
+        return script
+
+    def __call__( self, byteRange ):
+        return self.script().parseRange( byteRange )
+
+
+class TopicScript(object):
+    # The part of a census2011_* topic script that is the same for every
+    # topic: the options, reading (worker processes, --pipeline, --cache),
+    # the dictionary of rows, the output files (CSV or SQLite, compressed,
+    # sorted) and the run itself.  The script module gives the topic:
+    #   geoLevels, columnHeaders, dataColumns, dataTypes   its schema
+    #   provinces   the selected provinces (set by configure())
+    #   formatData( row )   (UID or False, row) for a row of dataColumns;
+    #       it and checkData, if there is one, are timed under --metrics
+    #   headerRows   header rows of its input (default 1)
+    #   cityIds   True when its UIDs are city codes (default: UID prefixes)
+    #   iterRows( script, csvReader )   the (UID or False, row) of the rows read,
+    #       if not just formatData of each
+    #   iterRecords( script, inputFiles, streaming, pool )   the output
+    #       records when the topic has several inputs to join, streaming
+    #       from script.streamRows; by default the rows of its one input
+    # Module functions are looked up when they are called, so the timed
+    # ones are used once configure() has put them in place.
+
+    def __init__( self, module, title, inputNames, streamUsage=None, numpy=False ):
+        self.module = module
+        self.title = title
+        self.inputNames = inputNames  # for the usage line, e.g. ['LANGUAGE.csv']
+        self.streamUsage = streamUsage or "write rows as they are read (constant memory, file order)"
+        self.numpy = numpy  # whether --numpy has checks to do (else it is ignored with a notice)
+        headers = module.columnHeaders
+        self.columnHeaders = headers.split( ',' ) if isinstance( headers, str ) else list( headers )
+        self.headerRows = getattr( module, 'headerRows', 1 )
+        self.cityIds = getattr( module, 'cityIds', False )
+        self.options = []  # the options configure() was given
+        self.columnarEngine = False  # --numpy: numeric checks on batches of rows
+        self.cacheDir = None  # --cache=DIR: parsed-input cache
+        self.cacheSize = 2048 << 20  # --cache-size=MB
+        self.outputCompression = None  # --compress=gz|bz2|xz
+        self.compressLevel = None  # --compress-level=1..9
+        self.sqliteFile = None  # --sqlite=FILE: tables in FILE instead of CSV files
+        self.sortRunSize = None  # --sort-output[=ROWS]: rows in UID order, ROWS held per sorted run
+        self.pipelineDepth = None  # --pipeline[=BATCHES]: read and write in threads, BATCHES queued between stages
+        self.inputRunSize = None  # streamRows in UID order, this many rows held per sorted run
+
+    def configure( self, options ):
+        # the settings of the command line options; formatData and checkData
+        # are timed if metrics are enabled
+        import census2011_sort  # imports this module
+        module = self.module
+        self.options = list( options )
+        module.provinces = selectProvinces( getOption( options, 'provinces' ) )
+        if self.numpy:
+            self.columnarEngine = ('--numpy' in options) and columnar.available()
+            if ('--numpy' in options) and not self.columnarEngine:
+                print ">>numpy is not installed, using the row engine"
+        elif '--numpy' in options:
+            # checkData's conversion already validates every cell
+            print ">>numpy has no checks for this topic, using the row engine"
+        self.cacheDir = getOption( options, 'cache' )
+        self.cacheSize = int( getOption( options, 'cache-size', self.cacheSize >> 20 )) << 20
+        self.outputCompression = getOption( options, 'compress' )
+        if getOption( options, 'compress-level' ):
+            self.compressLevel = int( getOption( options, 'compress-level' ))
+        self.sqliteFile = getOption( options, 'sqlite' )
+        if getOption( options, 'sort-output' ) is True:
+            self.sortRunSize = census2011_sort.runSize
+        elif getOption( options, 'sort-output' ):
+            self.sortRunSize = int( getOption( options, 'sort-output' ))
+        if getOption( options, 'pipeline' ) is True:
+            self.pipelineDepth = census2011_pipeline.queueDepth
+        elif getOption( options, 'pipeline' ):
+            self.pipelineDepth = int( getOption( options, 'pipeline' ))
+        if metrics.enabled:
+            module.formatData = metrics.timedCall( 'filter', module.formatData )
+            if hasattr( module, 'checkData' ):
+                module.checkData = metrics.timedCall( 'validate', module.checkData )
+
+    def provinceOf( self, id ):
+        if self.cityIds:
+            return self.module.provinces.cityProvince( id )
+        return self.module.provinces.prefixProvince( str(id) )
+
+    def createOutputFiles( self, stub ):
+        import census2011_sort  # imports this module
+        module = self.module
+        if self.sqliteFile:
+            outputFiles = SqliteOutputSet( self.sqliteFile, stub, module.geoLevels, module.provinces, self.columnHeaders )
+        else:
+            outputFiles = OutputSet( stub, module.geoLevels, module.provinces,
+                    compress=self.outputCompression, level=self.compressLevel )
+        if self.sortRunSize:
+            return census2011_sort.SortedOutputSet( outputFiles, self.sortRunSize )
+        return outputFiles
+
+    def writeHeader( self, fileList ):
+        for f in fileList:
+            f.write( ','.join( self.columnHeaders ) +'\n' )
+
+    def iterCSV( self, inputFile, fieldNames=None ):
+        module = self.module
+        if self.cityIds:
+            markers = module.provinces.cityMarkers()
+        else:
+            markers = module.provinces.prefixMarkers()
+        csvReader = ProjectedReader( inputFile, module.dataColumns, headerRows=self.headerRows,
+                prefilter=markers, fieldNames=fieldNames )
+        if hasattr( module, 'iterRows' ):
+            rows = module.iterRows( self, csvReader )
+        else:
+            rows = (module.formatData( line ) for line in csvReader)
+        for rowId, data in rows:
+            if rowId:
+                yield rowId, data
+
+    def parseRange( self, byteRange ):
+        # worker for parallelRows: the accepted rows of one slice of the input
+        fileName, start, end, fieldNames = byteRange
+        return list( self.iterCSV( readRange( fileName, start, end ), fieldNames ))
+
+    def readRows( self, inputFile, pool=None ):
+        if pool and not compression( inputFile.name ):  # no byte ranges in compressed files
+            return parallelRows( inputFile, self.headerRows, RangeParser( self ), pool )
+        if self.pipelineDepth:
+            inputFile = census2011_pipeline.LineReader( inputFile, self.pipelineDepth )
+        return self.iterCSV( inputFile )
+
+    def readCachedRows( self, inputFile, pool=None ):
+        # readRows through the parsed-input cache when --cache is given
+        import census2011_cache  # imports this module
+        if self.cacheDir is None:
+            return self.readRows( inputFile, pool )
+        # the rows are kept after formatData and checkData, so the schema
+        # has the code that filters and converts them, as schemaFingerprint
+        # (census2011_batch) does for the outputs
+        module = self.module
+        codeDir = os.path.dirname( os.path.abspath( __file__ ))
+        code = [sourceFile( module.__file__ )] + [os.path.join( codeDir, name ) for name in parseCode]
+        schema = (os.path.basename( sourceFile( module.__file__ )), module.dataColumns, module.dataTypes,
+                module.provinces.names, [census2011_cache.fileHash( name ) for name in code])
+        return census2011_cache.cachedRows( self.cacheDir, self.cacheSize, inputFile.name, schema,
+                lambda: self.readRows( inputFile, pool ))
+
+    def streamRows( self, inputFile, pool=None ):
+        # the rows for streaming: as they are read, or, with inputRunSize, in
+        # UID order and the last of each UID, the way a dictionary of them has
+        # them, sorted in bounded memory
+        import census2011_sort  # imports this module
+        if not self.inputRunSize:
+            return self.readRows( inputFile, pool )
+        print ">>streamRows - sorting:" + inputFile.name
+        return census2011_sort.sortedRows( self.readCachedRows( inputFile, pool ), self.inputRunSize, unique=True )
+
+    def getDictionaryFromCSV( self, inputFile, pool=None ):
+        print ">>getDictionaryFromCSV:" + inputFile.name
+        csvDictionary = RecordStore()
+        for rowId, data in self.readCachedRows( inputFile, pool ):
+            csvDictionary[ rowId ] = data
+        return csvDictionary
+
+    def iterRecords( self, inputFiles, streaming=False, pool=None ):
+        # yields output records [id, name, ...]
+        # streaming: rows are written in file order as they are read, nothing is
+        # held in memory; duplicate ids are all written rather than last-one-wins
+        if hasattr( self.module, 'iterRecords' ):
+            for record in self.module.iterRecords( self, inputFiles, streaming, pool ):
+                yield record
+            return
+        if streaming:
+            print ">>iterRecords - streaming:" + inputFiles[0].name
+            rows = self.streamRows( inputFiles[0], pool )
+        else:
+            rows = self.getDictionaryFromCSV( inputFiles[0], pool ).iteritems()
+        for id, data in rows:
+            yield [id] + data
+
+    def outputRecord( self, combinedRecord, outputFiles ):
+        id = combinedRecord[0]
+        outputFiles.writeRow( self.provinceOf( id ), id, combinedRecord )
+
+    def processCensus( self, inputFiles, outputFiles, streaming=False, workers=1 ):
+        #process input files as CSVs
+        pool = createPool( workers )
+        if self.pipelineDepth:
+            outputFiles = census2011_pipeline.RowWriter( outputFiles, self.pipelineDepth )
+        try:
+            for record in metrics.timedIter( 'join', self.iterRecords( inputFiles, streaming, pool )):
+                self.outputRecord( record, outputFiles )
+            outputFiles.flush()
+        finally:
+            closePool( pool )
+
+    def closeFiles( self, fileList ):
+        for f in fileList:
+            print ">>closeFiles - closing:" + f.name
+            f.close()
+
+    def getCommandLine( self ):
+        args = [a for a in sys.argv[1:] if not a.startswith('--')]
+        options = [a for a in sys.argv[1:] if a.startswith('--')]
+        if (len(args) == len(self.inputNames) + 1):
+            if all( [os.path.isfile( name ) for name in args[:-1]] ):
+                return args[:-1],args[-1],options
+        return [],"",options
+
+    def printUsage( self ):
+        print "Usage:"
+        print "python " + sys.argv[0] + " " + ' '.join( ['<%s>' % name for name in self.inputNames] ) + \
+                " <OUTPUTSTUB> [options]\n"
+        print "  --stream   " + self.streamUsage
+        print "  --provinces=BC,AB,..   write <OUTPUTSTUB>_<PROV>_<LEVEL>.csv for each province"
+        if self.numpy:
+            print "  --numpy   check totals on batches of rows with numpy"
+        print "  --cache=DIR   keep parsed inputs in DIR for reruns (--cache-size=MB, default 2048)"
+        print "  --compress=gz|bz2|xz   compress the outputs (--compress-level=1..9);"
+        print "      inputs ending in .gz, .bz2 or .xz are decompressed as they are read"
+        print "  --sqlite=FILE   write each level to a table in the SQLite file FILE instead"
+        print "  --sort-output[=ROWS]   write the rows in UID order, sorting ROWS at a time"
+        print "      (default 500000) in temporary files"
+        print "  --rejects=FILE   write the rows that were dropped, and why, to FILE"
+        print "  --metrics[=FILE]   time each stage and count its rows: a table at exit, or JSON in FILE"
+        print "  --pipeline[=BATCHES]   read, parse and write in separate threads, up to BATCHES"
+        print "      (default %d) batches apart; for compressed or network inputs" % census2011_pipeline.queueDepth
+        print "  --workers=N   parse the input with N processes\n"
+
+    def main( self ):
+        print self.title
+
+        inputFileNames,outputStub,options = self.getCommandLine()
+        if (not inputFileNames) :
+            self.printUsage()
+            sys.exit(1)
+
+        print "Reading: %s" % ', '.join( inputFileNames )
+        print "Exporting: %s" % outputStub
+
+        inputFiles = [openInput( name ) for name in inputFileNames]
+        if getOption( options, 'rejects' ):
+            rejects.open( getOption( options, 'rejects' ))
+        if getOption( options, 'metrics' ):
+            metrics.enable()
+        self.configure( options )
+        outputFiles = self.createOutputFiles( outputStub )
+
+        self.writeHeader( outputFiles.files )
+        self.processCensus( inputFiles, outputFiles, '--stream' in options,
+                int( getOption( options, 'workers', 1 )))
+        self.closeFiles( inputFiles )
+        outputFiles.close()
+        rejects.close()
+        if metrics.enabled:
+            metrics.report( getOption( options, 'metrics' ))
@@ -11,12 +11,13 @@
 
 
 import sys
-import os
-import re
-import csv
 
+from census2011_common import parseGeographyUID, selectProvinces, rejects, RowConverter, \
+        TopicScript
 
-provinceCodes = {'BC':59}
+
+provinces = selectProvinces( None )
+cityIds = True  # UIDs are city codes
 geoLevels = [
         {'name':'Province', 'code':'PR', 'codeLength':2},
         {'name':'City', 'code':'CITY', 'codeLength':3},
@@ -25,147 +26,72 @@ geoLevels = [
         {'name':'Dissemination area', 'code':'DA', 'codeLength':8}
     ]
 dataDictionary = [
-        ["UID",""],
-        ["GEOGRAPHY","Geography"],
-        ["TTOTINCPOP","Total - Total income in 2010"],
-        ["TWTHOUTINC","Without income"],
-        ["TWTHINC","With income"],
-        ["TUNDR5000","Under $5,000"],
-        ["T5TO10000","$5,000 to $9,999"],
-        ["T10TO15000","$10,000 to $14,999"],
-        ["T15TO20000","$15,000 to $19,999"],
-        ["T20TO30000","$20,000 to $29,999"],
-        ["T30TO40000","$30,000 to $39,999"],
-        ["T40TO50000","$40,000 to $49,999"],
-        ["T50TO60000","$50,000 to $59,999"],
-        ["T60TO80000","$60,000 to $79,999"],
-        ["T80TO100000","$80,000 to $99,999"],
-        ["TOVER100","$100,000 and over"],
-        ["TMEDIAN","Median income $"],
-        ["TAVERAGE","Average income $"],
-        ["FTOTINCFAM","Total - Economic family total income in 2010"],
-        ["FUNDER5","Under $5,000"],
-        ["F5TO10000","$5,000 to $9,999"],
-        ["F10TO15000","$10,000 to $14,999"],
-        ["F15TO20000","$15,000 to $19,999"],
-        ["F20TO30000","$20,000 to $29,999"],
-        ["F30TO40000","$30,000 to $39,999"],
-        ["F40TO50000","$40,000 to $49,999"],
-        ["F50TO60000","$50,000 to $59,999"],
-        ["F60TO80000","$60,000 to $79,999"],
-        ["F80TO100000","$80,000 to $99,999"],
-        ["FOVER100","$100,000 and over"],
-        ["FMEDIAN","Median family income $"],
-        ["FAVERAGE","Average family income $"]
+        ["UID","","id"],
+        ["GEOGRAPHY","Geography","text"],
+        ["TTOTINCPOP","Total - Total income in 2010","count"],
+        ["TWTHOUTINC","Without income","count"],
+        ["TWTHINC","With income","count"],
+        ["TUNDR5000","Under $5,000","count"],
+        ["T5TO10000","$5,000 to $9,999","count"],
+        ["T10TO15000","$10,000 to $14,999","count"],
+        ["T15TO20000","$15,000 to $19,999","count"],
+        ["T20TO30000","$20,000 to $29,999","count"],
+        ["T30TO40000","$30,000 to $39,999","count"],
+        ["T40TO50000","$40,000 to $49,999","count"],
+        ["T50TO60000","$50,000 to $59,999","count"],
+        ["T60TO80000","$60,000 to $79,999","count"],
+        ["T80TO100000","$80,000 to $99,999","count"],
+        ["TOVER100","$100,000 and over","count"],
+        ["TMEDIAN","Median income $","dollars"],
+        ["TAVERAGE","Average income $","dollars"],
+        ["FTOTINCFAM","Total - Economic family total income in 2010","count"],
+        ["FUNDER5","Under $5,000","count"],
+        ["F5TO10000","$5,000 to $9,999","count"],
+        ["F10TO15000","$10,000 to $14,999","count"],
+        ["F15TO20000","$15,000 to $19,999","count"],
+        ["F20TO30000","$20,000 to $29,999","count"],
+        ["F30TO40000","$30,000 to $39,999","count"],
+        ["F40TO50000","$40,000 to $49,999","count"],
+        ["F50TO60000","$50,000 to $59,999","count"],
+        ["F60TO80000","$60,000 to $79,999","count"],
+        ["F80TO100000","$80,000 to $99,999","count"],
+        ["FOVER100","$100,000 and over","count"],
+        ["FMEDIAN","Median family income $","dollars"],
+        ["FAVERAGE","Average family income $","dollars"]
     ]
 columnHeaders= [d[0] for d in dataDictionary] #field names in destination file
 dataColumns = [d[1] for d in dataDictionary[1:] ] #field names in origin file
+dataTypes = [d[2] for d in dataDictionary[1:] ]    #types of the origin fields
+convertRow = RowConverter( dataTypes )
 
 
-def createOutputFiles( stub ):
-    openFiles = []
-    for i in geoLevels:
-        newFile = stub + '_' + i['code'] + '.csv'
-        print ">>createOutputFiles - creating: " + newFile
-        f = open( newFile, 'w' )
-        openFiles.append( f )
-    return openFiles
-
-
-def writeHeader( fileList ):
-    for f in fileList:
-        f.write( ','.join( columnHeaders ) +'\n' )
-
-
-def formatData( d ):
+def formatData( row ):
+    # row holds the dataColumns, Geography first
     rowId = False
-    row = [d[i] for i in dataColumns]
-    searchId = re.search(r"\((\d+)\)", d['Geography'])
-    if searchId:
-        _rowId = int(searchId.groups()[0])
+    uid = parseGeographyUID( row[0] )
+    if uid:
+        _rowId = int( uid )
         if checkData( _rowId, row ): rowId = _rowId
+    else:
+        rejects.add( 'filter', 'no UID', row )
     return rowId,row
 
 
 def checkData( id, d ):
-    if (900 < id < 980) or (id == provinceCodes['BC']):
+    # converts d in place to the dataTypes; suppressed cells become None
+    if provinces.cityProvince( id ):
         try:
-            float( d[1] )  # are numbers valid?
+            d[:] = convertRow( d )
             return True
         except ValueError:
+            rejects.add( 'validate', 'not a number', d, id )
             return False
+    rejects.add( 'filter', 'province', d, id )
     return False
 
 
-def getDictionaryFromCSV( inputFile ):
-    print ">>getDictionaryFromCSV:" + inputFile.name
-    csvDictionary = {}
-    csvReader = csv.DictReader( inputFile )
-    csvReader.fieldnames = [field.strip() for field in csvReader.fieldnames]
-    for line in csvReader:
-        rowId, data = formatData( line )
-        if rowId:
-            csvDictionary[ rowId ] = data
-        else:
-            #print "rejected: " + ','.join(data)
-            pass
-            
-    return csvDictionary
-
-
-def outputRecord( id, name, rA, outputFiles):
-    combinedRecord = [id, name ] + rA 
-    for i in range(0, len(geoLevels)):
-        if id < 10 ** geoLevels[i]['codeLength']:
-            outputFiles[i].write( ','.join( [str(f) for f in combinedRecord] ) + '\n')
-            break
-
-
-def processCensus( inputFiles, outputFiles ):
-    #process input files as CSVs
-    csvA = getDictionaryFromCSV( inputFiles[0] )
-
-    for id in csvA.keys():
-        outputRecord( id, csvA[id][0], csvA[id][1:], outputFiles ) 
-
-
-def closeFiles( fileList ):
-    for f in fileList:
-        print ">>closeFiles - closing:" + f.name 
-        f.close()
-
-
-def getCommandLine():
-    if (len(sys.argv) ==3):
-        if os.path.isfile( sys.argv[1] ) :
-            return sys.argv[1],sys.argv[2]
-    return "",""
-
-
-def printUsage():
-    print "Usage:"
-    print "python " + sys.argv[0] + " <INCOME.csv> <OUTPUTSTUB>\n"
+script = TopicScript( sys.modules[__name__], "Format Census 2011: Language module", ['INCOME.csv'] )
 
 
 if __name__ == "__main__":
-    print "Format Census 2011: Language module"
-
-    inputFileNameA,outputStub = getCommandLine()
-    if (not inputFileNameA) :
-        printUsage()
-        sys.exit(1)
-
-    else:
-        print "Reading: %s" % (inputFileNameA)
-        print "Exporting: %s" % outputStub
-
-        inputFiles = []
-        inputFiles.append( open( inputFileNameA ))
-        outputFiles = createOutputFiles( outputStub )
-
-        writeHeader( outputFiles )
-        processCensus( inputFiles, outputFiles )
-        closeFiles( inputFiles + outputFiles )
-
-
-
+    script.main()
@@ -0,0 +1,316 @@
+###########################################################
+# census2011_lookup.py
+#
+# Answer census queries in-process from a topic's formatted
+# outputs instead of searching the <STUB>_<LEVEL>.csv files:
+#   index = CensusIndex.fromTables( 'age', 'out/age' )
+#   index.get( 59150004 )               one row, as a dict
+#   index.within( 5915, 'DA' )          every DA of a CD (or PR)
+#   index.within( 5915022, 'DA' )       every DA of a CSD (addParents)
+#   index.value( 59150004, 'TOTALPOP' )
+#
+# Each geo level keeps its UIDs sorted in an array, so a row
+# is found by bisection.  A DA's UID starts with its CD's and
+# a CD's with its province's (parentLevels), so the DAs of a
+# CD or a province are one range of that array.  CSDs are not
+# in DA codes; their DAs come from a PARENTUID,DAUID file (as
+# for census2011_rollup --parents), kept sorted by parent.
+# Columns are typed arrays: 'l' when every cell is a whole
+# number or suppressed ('x', '..', empty: nullInt), 'd' when
+# some are fractions (suppressed: nan), a list of strings
+# otherwise.  Suppressed cells are returned as None, so
+# counts stay ints.
+#
+# save() and load() keep the index in a binary snapshot
+# (marshal of the arrays' bytes), which loads far faster than
+# the CSVs; it is tied to the machine and Python version that
+# wrote it.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import sys
+import os
+import csv
+import imp
+import time
+import marshal
+from array import array
+from bisect import bisect_left, bisect_right
+
+from census2011_common import getOption, suppressedCells
+from census2011_batch import scriptDir, topicScripts
+from census2011_rollup import findTable, readTable, readParents, prefixLevels
+
+
+snapshotVersion = 1
+nan = float( 'nan' )
+nullInt = -(1 << (8 * array( 'l' ).itemsize - 1))  # a suppressed cell of an 'l' column
+
+
+def typedColumn( cells ):
+    # cells as an array('l') (nullInt for the suppressed cells), an
+    # array('d') (nan) when some cells are fractions, or a list when some
+    # cells are text
+    try:
+        return array( 'l', [int( c ) for c in cells] )
+    except (ValueError, OverflowError):
+        pass
+    try:
+        return array( 'l', [nullInt if c.strip() in suppressedCells else int( c ) for c in cells] )
+    except (ValueError, OverflowError):
+        pass
+    values = array( 'd' )
+    for c in cells:
+        try:
+            values.append( float( c ))
+        except ValueError:
+            if c.strip() not in suppressedCells:
+                return list( cells )
+            values.append( nan )
+    return values
+
+
+def isNull( value ):
+    # a suppressed cell of a typed column
+    return (value != value) or (value == nullInt)
+
+
+def packColumn( column ):
+    if isinstance( column, array ):
+        return (column.typecode, column.tostring())
+    return (None, column)
+
+
+def unpackColumn( packed ):
+    typecode, data = packed
+    if typecode is None:
+        return data
+    column = array( typecode )
+    column.fromstring( data )
+    return column
+
+
+class LevelIndex(object):
+    # The rows of one geo level: uids (sorted array), names and the
+    # typed columns, all in UID order; parents when addParents was called.
+
+    def __init__( self, code, codeLength, uids, names, columnNames, columns ):
+        self.code = code
+        self.codeLength = codeLength
+        self.uids = uids
+        self.names = names
+        self.columnNames = columnNames
+        self.columns = columns
+        self.columnIndex = dict( [(columnNames[n], n) for n in range(0, len(columnNames))] )
+        self.parentUids = None
+        self.parentRows = None
+
+    @classmethod
+    def fromRows( cls, code, codeLength, header, rows ):
+        # rows are (uid, name, cells) in any order
+        rows = sorted( rows, key=lambda row: row[0] )
+        uids = array( 'l', [row[0] for row in rows] )
+        names = [intern( row[1] ) for row in rows]
+        cells = zip( *[row[2] for row in rows] ) if rows else [()] * (len(header) - 2)
+        return cls( code, codeLength, uids, names, header, [typedColumn( c ) for c in cells] )
+
+    def find( self, uid ):
+        # row number of uid, or None
+        i = bisect_left( self.uids, uid )
+        if (i < len( self.uids )) and (self.uids[i] == uid):
+            return i
+        return None
+
+    def prefixRange( self, prefix, digits ):
+        # (first, end) row numbers of the UIDs that start with the digits of prefix
+        scale = 10 ** (self.codeLength - digits)
+        return bisect_left( self.uids, prefix * scale ), bisect_left( self.uids, (prefix + 1) * scale )
+
+    def cell( self, i, n ):
+        value = self.columns[n][i]
+        if isNull( value ):
+            return None
+        return value
+
+    def value( self, i, column ):
+        # the column of row i by name: the UID, the name or a cell (None if
+        # suppressed); KeyError for a name that is not a column
+        n = self.columnIndex.get( column )
+        if n is None:
+            raise KeyError( column )
+        if n == 0:
+            return self.uids[i]
+        if n == 1:
+            return self.names[i]
+        return self.cell( i, n - 2 )
+
+    def row( self, i ):
+        # {'UID':, <name column>:, <column>: value, ...}
+        row = dict( zip( self.columnNames[2:], [None if isNull( c[i] ) else c[i] for c in self.columns] ))
+        row[self.columnNames[0]] = self.uids[i]
+        row[self.columnNames[1]] = self.names[i]
+        return row
+
+    def addParents( self, parents ):
+        # parents is {uid: parent uid}; rows without one are left out
+        pairs = sorted( [(parents[self.uids[i]], i) for i in range(0, len(self.uids)) if self.uids[i] in parents] )
+        self.parentUids = array( 'l', [p for p, i in pairs] )
+        self.parentRows = array( 'l', [i for p, i in pairs] )
+
+    def childRows( self, parent ):
+        first = bisect_left( self.parentUids, parent )
+        end = bisect_right( self.parentUids, parent )
+        return self.parentRows[first:end]
+
+    def pack( self ):
+        return {'code':self.code, 'codeLength':self.codeLength, 'uids':packColumn( self.uids ),
+                'names':self.names, 'columnNames':self.columnNames,
+                'columns':[packColumn( c ) for c in self.columns],
+                'parents':(packColumn( self.parentUids ), packColumn( self.parentRows ))
+                          if self.parentUids is not None else None}
+
+    @classmethod
+    def unpack( cls, packed ):
+        level = cls( packed['code'], packed['codeLength'], unpackColumn( packed['uids'] ),
+                [intern( name ) for name in packed['names']], packed['columnNames'],
+                [unpackColumn( c ) for c in packed['columns']] )
+        if packed['parents'] is not None:
+            level.parentUids = unpackColumn( packed['parents'][0] )
+            level.parentRows = unpackColumn( packed['parents'][1] )
+        return level
+
+
+class CensusIndex(object):
+    # The levels of one topic's outputs, by code.  UIDs are ints (or
+    # strings of digits); a UID's level is found from its number of digits.
+
+    def __init__( self, topic, levels ):
+        self.topic = topic
+        self.levels = dict( [(level.code, level) for level in levels] )
+        self.byDigits = dict( [(level.codeLength, level) for level in levels] )
+
+    @classmethod
+    def fromTables( cls, topic, stub ):
+        # the <stub>_<LEVEL>.csv tables of the topic's geoLevels that exist
+        module = imp.load_source( 'census2011_lookup_' + topic, os.path.join( scriptDir, topicScripts[topic] ))
+        levels = []
+        for geoLevel in module.geoLevels:
+            fileName = findTable( stub, geoLevel['code'] )
+            if fileName:
+                print ">>fromTables - reading: " + fileName
+                header, rows = readTable( fileName )
+                levels.append( LevelIndex.fromRows( geoLevel['code'], geoLevel['codeLength'], header, rows ))
+        return cls( topic, levels )
+
+    @classmethod
+    def load( cls, fileName ):
+        f = open( fileName, 'rb' )
+        packed = marshal.load( f )
+        f.close()
+        if packed.get( 'version' ) != snapshotVersion:
+            raise ValueError( "%s: not a version %d snapshot" % (fileName, snapshotVersion) )
+        return cls( packed['topic'], [LevelIndex.unpack( level ) for level in packed['levels']] )
+
+    def save( self, fileName ):
+        f = open( fileName, 'wb' )
+        marshal.dump( {'version':snapshotVersion, 'topic':self.topic,
+                       'levels':[level.pack() for level in self.levels.values()]}, f )
+        f.close()
+
+    def addParents( self, parents, code='DA' ):
+        # parents ({uid of code: parent uid}, e.g. from readParents) for within()
+        self.levels[code].addParents( parents )
+
+    def locate( self, uid ):
+        # (level, row number) of uid, or (None, None)
+        uid = int( uid )
+        level = self.byDigits.get( len( str( uid )) )
+        if level is None:
+            return None, None
+        i = level.find( uid )
+        if i is None:
+            return None, None
+        return level, i
+
+    def get( self, uid ):
+        # the row of uid as a dict, or None
+        level, i = self.locate( uid )
+        if level is None:
+            return None
+        return level.row( i )
+
+    def value( self, uid, column ):
+        # one cell of uid's row, None if suppressed; KeyError if uid is not there
+        level, i = self.locate( uid )
+        if level is None:
+            raise KeyError( uid )
+        return level.value( i, column )
+
+    def within( self, uid, code='DA' ):
+        # the rows of level code inside uid: by UID prefix when uid's level is
+        # one code nests in by prefix (CD, PR for DA), else by addParents
+        level = self.levels[code]
+        digits = len( str( int( uid )))
+        if digits in [length for parent, length in prefixLevels( code )]:
+            first, end = level.prefixRange( int( uid ), digits )
+            rows = range( first, end )
+        elif level.parentUids is not None:
+            rows = level.childRows( int( uid ))
+        else:
+            raise ValueError( "%s rows of %s: not by UID prefix and no parents were added" % (code, uid) )
+        return [level.row( i ) for i in rows]
+
+
+def getCommandLine():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    options = [a for a in sys.argv[1:] if a.startswith('--')]
+    if getOption( options, 'load' ):
+        return "","",args,options
+    if (len(args) >=2) and (args[0] in topicScripts):
+        return args[0],args[1],args[2:],options
+    return "","",[],options
+
+
+def printUsage():
+    print "Usage:"
+    print "python " + sys.argv[0] + " <topic> <STUB> [UID ...] [options]"
+    print "python " + sys.argv[0] + " --load=SNAPSHOT [UID ...] [options]\n"
+    print "  prints the row of each UID, or with --within=LEVEL the LEVEL rows inside it"
+    print "  --within=DA   the rows of this level inside each UID"
+    print "  --parents=FILE   PARENTUID,DAUID rows, for the DAs of CSDs and other parents"
+    print "  --save=SNAPSHOT   write the index to a binary snapshot"
+    print "  --load=SNAPSHOT   read the index from a snapshot instead of the CSV files\n"
+
+
+if __name__ == "__main__":
+    topic,stub,uids,options = getCommandLine()
+    if (not topic) and (not getOption( options, 'load' )) :
+        printUsage()
+        sys.exit(1)
+
+    start = time.time()
+    if getOption( options, 'load' ):
+        index = CensusIndex.load( getOption( options, 'load' ))
+    else:
+        index = CensusIndex.fromTables( topic, stub )
+    if getOption( options, 'parents' ):
+        index.addParents( readParents( getOption( options, 'parents' )))
+    print ">>index of %s: %s rows (%.2fs)" % (index.topic, ', '.join( ['%d %s' % (len( level.uids ), code)
+            for code, level in sorted( index.levels.items() )] ), time.time() - start)
+    if getOption( options, 'save' ):
+        index.save( getOption( options, 'save' ))
+        print ">>index saved to " + getOption( options, 'save' )
+
+    code = getOption( options, 'within' )
+    writer = csv.writer( sys.stdout, lineterminator='\n' )
+    for uid in uids:
+        start = time.time()
+        rows = index.within( uid, code ) if code else [row for row in [index.get( uid )] if row is not None]
+        elapsed = time.time() - start
+        if rows:
+            level = index.levels[code] if code else index.locate( uid )[0]
+            writer.writerow( level.columnNames )
+            writer.writerows( [[row[name] for name in level.columnNames] for row in rows] )
+        print ">>%s: %d row(s) in %.1f us" % (uid, len( rows ), elapsed * 1e6)
@@ -0,0 +1,170 @@
+###########################################################
+# census2011_metrics.py
+#
+# Stage timings and row counts for the census2011_* scripts
+# (--metrics).  The stages are
+#   read      lines of the input (bytes read)
+#   parse     lines split into the wanted columns
+#   filter    formatData: UID and province
+#   validate  checkData
+#   join      iterRecords: dictionaries, joins
+#   write     outputRecord: routing and writing (bytes written)
+#   sort      --sort-output: spilling runs (bytes spilled) and
+#             merging them into the output files
+# Each stage's time leaves out the stages nested in it, and
+# rejected rows are counted by stage and reason.  With
+# --workers the read to validate times are summed over the
+# worker processes.  Each thread keeps its own stack of the
+# stages it is timing; with --pipeline the read time is the
+# time the parsing waited for lines from the reader thread,
+# and the write time is the writer thread's.
+#
+# Nothing is measured until enable() is called; until then
+# timedIter and timedCall hand back what they are given.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import json
+import time
+import threading
+
+
+stageNames = ('read', 'parse', 'filter', 'validate', 'join', 'write', 'sort')
+
+
+class Metrics(object):
+
+    def __init__( self ):
+        self.enabled = False
+        self.started = time.time()
+        self.stages = {}
+        self.local = threading.local()  # active: [start, time of nested stages] of the stages being timed
+
+    def enable( self ):
+        self.enabled = True
+        self.started = time.time()
+
+    def stage( self, name ):
+        stage = self.stages.get( name )
+        if stage is None:
+            stage = self.stages[name] = {'seconds':0.0, 'rowsIn':0, 'rowsOut':0, 'bytes':0, 'rejects':{}}
+        return stage
+
+    def add( self, name, key, n ):
+        if self.enabled:
+            self.stage( name )[key] += n
+
+    def reject( self, name, reason, n=1 ):
+        if self.enabled:
+            rejects = self.stage( name )['rejects']
+            rejects[reason] = rejects.get( reason, 0 ) + n
+
+    def activeStages( self ):
+        # the stages the calling thread is timing
+        try:
+            return self.local.active
+        except AttributeError:
+            self.local.active = []
+            return self.local.active
+
+    def start( self ):
+        self.activeStages().append( [time.time(), 0.0] )
+
+    def stop( self, stage ):
+        active = self.activeStages()
+        start, nested = active.pop()
+        elapsed = time.time() - start
+        stage['seconds'] += elapsed - nested
+        if active:
+            active[-1][1] += elapsed
+
+    def timedIter( self, name, iterable, size=None ):
+        # iterable, with the time spent getting its items and the items
+        # (and their size( item ) in bytes) counted under name
+        if not self.enabled:
+            return iterable
+        return self.iterItems( self.stage( name ), iter( iterable ), size )
+
+    def iterItems( self, stage, items, size ):
+        end = object()
+        while True:
+            self.start()
+            try:
+                item = next( items, end )
+            finally:
+                self.stop( stage )
+            if item is end:
+                return
+            stage['rowsOut'] += 1
+            if size:
+                stage['bytes'] += size( item )
+            yield item
+
+    def timedCall( self, name, function ):
+        # function, with its calls and the time spent in them counted under name
+        if not self.enabled:
+            return function
+        stage = self.stage( name )
+        def timed( *args, **kwargs ):
+            stage['rowsIn'] += 1
+            self.start()
+            try:
+                return function( *args, **kwargs )
+            finally:
+                self.stop( stage )
+        return timed
+
+    def snapshot( self ):
+        # the counts so far, cleared (for worker processes)
+        stages = self.stages
+        self.stages = {}
+        return stages
+
+    def merge( self, stages ):
+        for name, counts in stages.items():
+            stage = self.stage( name )
+            for key in ('seconds', 'rowsIn', 'rowsOut', 'bytes'):
+                stage[key] += counts[key]
+            for reason, n in counts['rejects'].items():
+                stage['rejects'][reason] = stage['rejects'].get( reason, 0 ) + n
+
+    def summary( self ):
+        # {'seconds': wall time, 'stages': [{'stage':name, ...}, ...]}; a stage
+        # that does not count its input takes the output of the one before,
+        # and one that does not count its output passes what it did not reject
+        stages = []
+        previous = None
+        names = [n for n in stageNames if n in self.stages] + sorted( set( self.stages ) - set( stageNames ))
+        for name in names:
+            stage = dict( self.stages[name], stage=name )
+            rejected = sum( stage['rejects'].values() )
+            if (not stage['rowsIn']) and previous:
+                stage['rowsIn'] = previous['rowsOut']
+            if (not stage['rowsOut']) and stage['rowsIn']:
+                stage['rowsOut'] = stage['rowsIn'] - rejected
+            stage['rejected'] = rejected
+            stages.append( stage )
+            previous = stage
+        return {'seconds':time.time() - self.started, 'stages':stages}
+
+    def report( self, target=True ):
+        # the summary as JSON in the file target, or as a table on stdout
+        summary = self.summary()
+        if target is not True:
+            f = open( target, 'w' )
+            json.dump( summary, f, indent=1, sort_keys=True )
+            f.close()
+            print ">>metrics written to " + target
+            return
+        print "%-9s %9s %10s %10s %9s %12s" % ('stage', 'seconds', 'rows in', 'rows out', 'rejected', 'bytes')
+        for stage in summary['stages']:
+            print "%-9s %9.2f %10d %10d %9d %12d" % (stage['stage'], stage['seconds'], stage['rowsIn'],
+                    stage['rowsOut'], stage['rejected'], stage['bytes'])
+            for reason, n in sorted( stage['rejects'].items() ):
+                print "%-9s   %-30s %9d" % ('', reason, n)
+        print "%-9s %9.2f" % ('total', summary['seconds'])
+
+
+metrics = Metrics()
@@ -0,0 +1,149 @@
+###########################################################
+# census2011_pipeline.py
+#
+# Threads for the topic scripts' --pipeline mode, so reading,
+# parsing and writing overlap instead of taking turns:
+#   LineReader   reads the input's lines ahead in a thread
+#                (and decompresses them, for .gz/.bz2/.xz)
+#   RowWriter    stands in for an OutputSet and writes the
+#                rows in a thread
+# while the script's own thread parses, checks and joins.
+# Lines and rows go between the threads in batches through
+# queues of at most depth batches; a stage that gets that far
+# ahead waits for the next one (backpressure), so memory stays
+# bounded.  The reading, decompressing and writing are done
+# with the interpreter lock released, which is where the
+# threads gain; parsing still runs in one thread at a time.
+#
+# An error in a thread is raised again in the script's thread
+# the next time it takes lines from or hands rows to it.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import sys
+import threading
+import Queue
+from itertools import chain
+
+
+queueDepth = 8  # batches queued between two stages
+readSize = 1 << 20  # bytes of lines per batch read
+batchSize = 2000  # rows per batch written
+
+
+def raiseError( error ):
+    # raises the sys.exc_info() of a thread again
+    raise error[0], error[1], error[2]
+
+
+class LineReader(object):
+    # inputFile's lines, read readSize bytes at a time by a thread that
+    # keeps up to depth batches ahead; readline() and iteration, as for
+    # a file (ProjectedReader, readHeader).
+
+    def __init__( self, inputFile, depth=queueDepth, readSize=readSize ):
+        self.name = inputFile.name
+        self.readSize = readSize
+        self.queue = Queue.Queue( depth )
+        self.error = None
+        self.lines = chain.from_iterable( self.batches() )
+        self.thread = threading.Thread( target=self.read, args=(inputFile,), name='reader' )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def read( self, inputFile ):
+        try:
+            while True:
+                lines = inputFile.readlines( self.readSize )
+                if not lines:
+                    break
+                self.queue.put( lines )
+        except Exception:
+            self.error = sys.exc_info()
+        self.queue.put( None )
+
+    def batches( self ):
+        while True:
+            lines = self.queue.get()
+            if lines is None:
+                break
+            yield lines
+        self.thread.join()
+        if self.error:
+            raiseError( self.error )
+
+    def __iter__( self ):
+        return self.lines
+
+    def readline( self ):
+        return next( self.lines, '' )
+
+
+class RowWriter(object):
+    # outputSet with writeRow() handing the rows to a thread, batchSize
+    # at a time through a queue of depth batches; everything else (files,
+    # byKey, router, ...) is the outputSet's.  flush() waits for the rows
+    # handed over so far to be written; the thread is started again by
+    # the next writeRow().
+
+    def __init__( self, outputSet, depth=queueDepth, batchSize=batchSize ):
+        self.output = outputSet
+        self.depth = depth
+        self.batchSize = batchSize
+        self.batch = []
+        self.thread = None
+        self.error = None
+
+    def __getattr__( self, attr ):
+        return getattr( self.output, attr )
+
+    def writeRow( self, province, id, row ):
+        # queues row for the writer thread; the outputSet rejects the rows
+        # without an output file
+        self.batch.append( (province, id, row) )
+        if len( self.batch ) >= self.batchSize:
+            self.put( self.batch )
+            self.batch = []
+        return True
+
+    def put( self, batch ):
+        if self.error:
+            raiseError( self.error )
+        if self.thread is None:
+            self.queue = Queue.Queue( self.depth )
+            self.thread = threading.Thread( target=self.write, name='writer' )
+            self.thread.daemon = True
+            self.thread.start()
+        self.queue.put( batch )
+
+    def write( self ):
+        writeRow = self.output.writeRow
+        try:
+            while True:
+                batch = self.queue.get()
+                if batch is None:
+                    return
+                for province, id, row in batch:
+                    writeRow( province, id, row )
+        except Exception:
+            self.error = sys.exc_info()
+            while self.queue.get() is not None:  # so put() does not wait on a full queue
+                pass
+
+    def flush( self ):
+        if self.batch:
+            self.put( self.batch )
+            self.batch = []
+        if self.thread is not None:
+            self.queue.put( None )
+            self.thread.join()
+            self.thread = None
+        if self.error:
+            raiseError( self.error )
+        self.output.flush()
+
+    def close( self ):
+        self.flush()
+        self.output.close()
@@ -0,0 +1,244 @@
+###########################################################
+# census2011_rollup.py
+#
+# Derive the higher levels of a topic from its DA table
+# (the <STUB>_DA.csv a topic script wrote) and check them
+# against the published ones:
+#   <OUTPUTSTUB>_CD.csv, <OUTPUTSTUB>_PR.csv   DA sums by UID prefix
+#   <OUTPUTSTUB>_<LEVEL>.csv   DA sums by a parents file (--parents)
+#   <OUTPUTSTUB>_diff.csv   LEVEL,UID,COLUMN,ROLLUP,PUBLISHED,DIFFERENCE,SUPPRESSED
+#
+# A DA code starts with its CD's and a CD code with its
+# province's (parentLevels), so those levels come from the
+# UID prefix.  Other parents (CSDs, which DA codes do not
+# hold, or any custom region) come from a CSV of
+# PARENTUID,DAUID rows.  Each level is one grouped sum over
+# all DAs (with numpy when it is installed).  Only count
+# columns (the dataDictionary types) add up; rates and
+# dollar amounts are left empty.
+#
+# A suppressed DA cell (empty) is left out of its parent's
+# sum and counted.  Such a sum is only a lower bound, so the
+# cell cannot be verified: it is listed in the diff file with
+# the number of suppressed DAs (SUPPRESSED), and only counts
+# as a difference when it exceeds the published value.  The
+# same goes for a parent whose published cell is suppressed.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import sys
+import os
+import csv
+import imp
+import time
+
+import census2011_columnar as columnar
+from census2011_common import getOption, openInput, openOutput, compressionSuffixes, \
+        parentLevels
+from census2011_batch import scriptDir, topicScripts
+
+
+def findTable( stub, code ):
+    # <stub>_<code>.csv or a compressed copy of it, None if there is none
+    for suffix in [''] + ['.' + s for s in compressionSuffixes]:
+        fileName = stub + '_' + code + '.csv' + suffix
+        if os.path.isfile( fileName ):
+            return fileName
+    return None
+
+
+def readTable( fileName ):
+    # header and rows [uid, name, cells] of a topic script's output table
+    f = openInput( fileName )
+    reader = csv.reader( f )
+    header = reader.next()
+    rows = [(int( row[0] ), row[1], row[2:]) for row in reader if row]
+    f.close()
+    return header, rows
+
+
+def additiveColumns( topic, header ):
+    # whether each column of header[2:] adds up from DAs to their parents,
+    # i.e. is a count (age has no dataDictionary: its columns all are)
+    module = imp.load_source( 'census2011_rollup_' + topic, os.path.join( scriptDir, topicScripts[topic] ))
+    types = dict( [(d[0], d[2]) for d in getattr( module, 'dataDictionary', [] )] )
+    return [types.get( name, 'count' ) == 'count' for name in header[2:]]
+
+
+def prefixLevels( code='DA' ):
+    # [(level, UID prefix length)] of the levels code nests in, e.g. CD, PR
+    levels = []
+    while code in parentLevels:
+        code, length = parentLevels[code]
+        levels.append( (code, length) )
+    return levels
+
+
+def readParents( fileName ):
+    # {DA UID: parent UID} from a CSV of PARENTUID,DAUID rows (header first)
+    f = openInput( fileName )
+    reader = csv.reader( f )
+    reader.next()
+    parents = dict( [(int( row[1] ), int( row[0] )) for row in reader if row] )
+    f.close()
+    return parents
+
+
+def toNumber( cell ):
+    try:
+        return float( cell )
+    except ValueError:
+        return float( 'nan' )
+
+
+def groupSums( keys, cells ):
+    # (distinct keys in order, column sums of cells for each, number of
+    # suppressed cells left out of each sum)
+    if not keys:
+        return [], [], []
+    if columnar.available():
+        return columnar.groupSums( keys, cells )
+    sums = {}
+    suppressed = {}
+    for key, row in zip( keys, cells ):
+        values = [toNumber( c ) for c in row]
+        missing = [int( v != v ) for v in values]
+        values = [0.0 if v != v else v for v in values]
+        if key in sums:
+            sums[key] = [a + b for a, b in zip( sums[key], values )]
+            suppressed[key] = [a + b for a, b in zip( suppressed[key], missing )]
+        else:
+            sums[key] = values
+            suppressed[key] = missing
+    groups = sorted( sums )
+    return groups, [sums[key] for key in groups], [suppressed[key] for key in groups]
+
+
+def formatNumber( value ):
+    if value != value:
+        return ''
+    if value == int( value ):
+        return '%d' % value
+    return repr( value )
+
+
+def writeLevel( fileName, header, groups, sums, names, additive ):
+    f = openOutput( fileName )
+    writer = csv.writer( f, lineterminator='\n' )
+    writer.writerow( header )
+    for key, total in zip( groups, sums ):
+        writer.writerow( [key, names.get( key, '' )] +
+                [formatNumber( v ) if additive[n] else '' for n, v in enumerate( total )] )
+    f.close()
+
+
+def compareLevel( level, header, groups, sums, suppressed, published, additive, tolerance, diffWriter ):
+    # writes the cells of the roll-up that differ from the published rows
+    # by more than tolerance, and the cells that cannot be verified (with
+    # suppressed DAs or a suppressed published cell); returns a one-line summary
+    compared = differing = unverified = 0
+    largest = 0.0
+    for key, total, missing in zip( groups, sums, suppressed ):
+        row = published.get( key )
+        if row is None:
+            continue
+        compared += 1
+        differs = False
+        for n in range(0, len(total)):
+            if not additive[n]:
+                continue
+            value = toNumber( row[n] )
+            difference = total[n] - value
+            if missing[n] or (value != value):
+                # the roll-up is a lower bound, or there is nothing to compare it with
+                unverified += 1
+                wrong = difference > tolerance
+                diffWriter.writerow( [level, key, header[n + 2], formatNumber( total[n] ), row[n],
+                                      formatNumber( difference ), missing[n]] )
+            else:
+                wrong = abs( difference ) > tolerance
+                if wrong:
+                    diffWriter.writerow( [level, key, header[n + 2], formatNumber( total[n] ), row[n],
+                                          formatNumber( difference ), 0] )
+            if wrong:
+                largest = max( largest, abs( difference ))
+                differs = True
+        if differs:
+            differing += 1
+    notPublished = len( groups ) - compared
+    noDAs = len( set( published ) - set( groups ))
+    return "%d rolled up, %d compared, %d differ (largest difference %s), %d cells not verifiable (suppressed), " \
+           "%d not published, %d published without DAs" % \
+            (len( groups ), compared, differing, formatNumber( largest ), unverified, notPublished, noDAs)
+
+
+def getCommandLine():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    options = [a for a in sys.argv[1:] if a.startswith('--')]
+    if (len(args) ==3) and (args[0] in topicScripts):
+        return args[0],args[1],args[2],options
+    return "","","",options
+
+
+def printUsage():
+    print "Usage:"
+    print "python " + sys.argv[0] + " <topic> <STUB> <OUTPUTSTUB> [options]\n"
+    print "  STUB is the output stub of the topic script, e.g. out/age or out/age_BC"
+    print "  --parents=FILE   also roll up to the parents in FILE (PARENTUID,DAUID rows)"
+    print "  --parents-level=CODE   level of those parents, compared with <STUB>_<CODE>.csv (default CUSTOM)"
+    print "  --tolerance=N   differences up to N are not reported (default 0)\n"
+
+
+if __name__ == "__main__":
+    print "Format Census 2011: roll-up"
+
+    topic,stub,outputStub,options = getCommandLine()
+    if (not topic) :
+        printUsage()
+        sys.exit(1)
+
+    daFileName = findTable( stub, 'DA' )
+    if not daFileName:
+        print ">>no DA table: %s_DA.csv" % stub
+        sys.exit(1)
+    print "Reading: %s" % daFileName
+    header, daRows = readTable( daFileName )
+    additive = additiveColumns( topic, header )
+    uids = [row[0] for row in daRows]
+    cells = [row[2] for row in daRows]
+    daLength = max( [len( str( uid )) for uid in uids] ) if uids else 8
+
+    # (level, DA keys) for each level to derive
+    levels = [(code, [uid // 10 ** (daLength - length) for uid in uids]) for code, length in prefixLevels()]
+    if getOption( options, 'parents' ):
+        parents = readParents( getOption( options, 'parents' ))
+        level = getOption( options, 'parents-level', 'CUSTOM' )
+        keys = [parents.get( uid ) for uid in uids]
+        print ">>%s: %d of %d DAs have no parent" % (level, keys.count( None ), len( keys ))
+        levels.append( (level, keys) )
+    tolerance = float( getOption( options, 'tolerance', 0 ))
+
+    diffFile = openOutput( outputStub + '_diff.csv' )
+    diffWriter = csv.writer( diffFile, lineterminator='\n' )
+    diffWriter.writerow( ['LEVEL', 'UID', 'COLUMN', 'ROLLUP', 'PUBLISHED', 'DIFFERENCE', 'SUPPRESSED'] )
+    for level, keys in levels:
+        start = time.time()
+        grouped = [(key, row) for key, row in zip( keys, cells ) if key is not None]
+        groups, sums, suppressed = groupSums( [key for key, row in grouped], [row for key, row in grouped] )
+        publishedFileName = findTable( stub, level )
+        published = {}
+        names = {}
+        if publishedFileName:
+            for uid, name, row in readTable( publishedFileName )[1]:
+                published[uid] = row
+                names[uid] = name
+        writeLevel( outputStub + '_' + level + '.csv', header, groups, sums, names, additive )
+        if publishedFileName:
+            summary = compareLevel( level, header, groups, sums, suppressed, published, additive, tolerance,
+                    diffWriter )
+        else:
+            summary = "%d rolled up, nothing published to compare" % len( groups )
+        print ">>%s: %s (%.2fs)" % (level, summary, time.time() - start)
+    diffFile.close()
@@ -0,0 +1,165 @@
+###########################################################
+# census2011_sort.py
+#
+# UID-ordered output for the topic scripts (--sort-output)
+# in bounded memory.  SortedOutputSet stands in for an
+# OutputSet: rows are held until runSize of them have been
+# written, then each file's rows are sorted by UID and spilled
+# to a temporary run file (TMPDIR), one block per output file.
+# close() merges each output file's blocks of all the runs
+# with the rows still held, in UID order, and writes them
+# through the OutputSet.  Rows with the same UID keep the
+# order they were written in.
+#
+# sortedRows does the same for a stream of (UID, row), for
+# readers that need their input in UID order (the wide table).
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import os
+import heapq
+import marshal
+import tempfile
+from operator import itemgetter
+
+from census2011_common import rejects
+from census2011_metrics import metrics
+
+
+runSize = 500000  # rows held before they are spilled to a run file
+chunkSize = 1000  # rows per marshal record in a run file
+
+
+def readBlock( runFile, offset, chunks ):
+    # the rows of one block of a run file
+    runFile.seek( offset )
+    for n in range(0, chunks):
+        for row in marshal.load( runFile ):
+            yield row
+
+
+def tagged( rows, run ):
+    # (id, run, n, row): ties on id go by run, then by position
+    n = 0
+    for id, row in rows:
+        yield id, run, n, row
+        n += 1
+
+
+def sortedRows( rows, runSize=runSize, unique=False ):
+    # (id, row) of rows in UID order, holding at most runSize of them: the
+    # rest are sorted in runs spilled to temporary files and merged back.
+    # unique: only the last row of each id, as a dictionary of them keeps
+    held = []
+    runs = []  # (run file, chunks)
+    try:
+        for id, row in rows:
+            held.append( (id, row) )
+            if len( held ) >= runSize:
+                held.sort( key=itemgetter( 0 ))
+                runFile = tempfile.TemporaryFile( prefix='census2011_sort', suffix='.run' )
+                for n in range(0, len( held ), chunkSize):
+                    marshal.dump( held[n:n + chunkSize], runFile )
+                runs.append( (runFile, (len( held ) + chunkSize - 1) // chunkSize) )
+                held = []
+        held.sort( key=itemgetter( 0 ))
+        streams = [tagged( readBlock( runs[n][0], 0, runs[n][1] ), n ) for n in range(0, len(runs))]
+        streams.append( tagged( held, len(runs) ))
+        last = None
+        for id, run, n, row in heapq.merge( *streams ):
+            if unique and (last is not None) and (last[0] != id):
+                yield last
+            elif not unique:
+                yield id, row
+            last = (id, row)
+        if unique and (last is not None):
+            yield last
+    finally:
+        for runFile, chunks in runs:
+            runFile.close()
+
+
+class SortedOutputSet(object):
+    # outputSet with its rows written in UID order by close(); everything
+    # else (files, byKey, router, ...) is the outputSet's.  The merge time
+    # is counted under 'sort', including the writing it does.
+
+    def __init__( self, outputSet, runSize=runSize ):
+        self.output = outputSet
+        self.runSize = runSize
+        self.held = {}
+        self.heldRows = 0
+        self.runs = []  # (file name, {key: (offset, chunks)})
+        self.writeRow = metrics.timedCall( 'write', self.writeRow )
+
+    def __getattr__( self, attr ):
+        return getattr( self.output, attr )
+
+    def writeRow( self, province, id, row ):
+        # holds row for the file of province and id; False if there is none
+        key = self.output.keyFor( province, id )
+        if not key:
+            rejects.add( 'write', 'no output file', row, id )
+            return False
+        self.held.setdefault( key, [] ).append( (id, row) )
+        self.heldRows += 1
+        if self.heldRows >= self.runSize:
+            self.spill()
+        return True
+
+    def spill( self ):
+        # the rows held so far, sorted, to a new run file
+        metrics.start()
+        handle, fileName = tempfile.mkstemp( prefix='census2011_sort', suffix='.run' )
+        runFile = os.fdopen( handle, 'wb' )
+        blocks = {}
+        for key, rows in self.held.items():
+            rows.sort( key=itemgetter( 0 ))
+            blocks[key] = (runFile.tell(), (len( rows ) + chunkSize - 1) // chunkSize)
+            for n in range(0, len( rows ), chunkSize):
+                marshal.dump( rows[n:n + chunkSize], runFile )
+        runFile.close()
+        self.runs.append( (fileName, blocks) )
+        metrics.add( 'sort', 'rowsIn', self.heldRows )
+        metrics.add( 'sort', 'bytes', os.path.getsize( fileName ))
+        metrics.stop( metrics.stage( 'sort' ))
+        self.held = {}
+        self.heldRows = 0
+
+    def flush( self ):
+        # nothing is written before close()
+        pass
+
+    def merge( self ):
+        metrics.start()
+        metrics.add( 'sort', 'rowsIn', self.heldRows )
+        runFiles = [open( fileName, 'rb' ) for fileName, blocks in self.runs]
+        try:
+            for key in sorted( self.output.byKey ):
+                streams = []
+                for n in range(0, len(self.runs)):
+                    if key in self.runs[n][1]:
+                        offset, chunks = self.runs[n][1][key]
+                        streams.append( tagged( readBlock( runFiles[n], offset, chunks ), n ))
+                streams.append( tagged( sorted( self.held.pop( key, [] ), key=itemgetter( 0 )), len(self.runs) ))
+                pending = self.output.pending[key]
+                rows = 0
+                for id, run, n, row in heapq.merge( *streams ):
+                    pending.append( row )
+                    rows += 1
+                    if len( pending ) >= self.output.batchSize:
+                        self.output.writeBatch( key )
+                metrics.add( 'sort', 'rowsOut', rows )
+        finally:
+            for f in runFiles:
+                f.close()
+                os.remove( f.name )
+        self.runs = []
+        self.heldRows = 0
+        metrics.stop( metrics.stage( 'sort' ))
+
+    def close( self ):
+        self.merge()
+        self.output.close()
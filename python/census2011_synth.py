@@ -0,0 +1,218 @@
+###########################################################
+# census2011_synth.py
+#
+# Write synthetic census inputs for every topic script, in
+# the layout of the StatsCan extracts, to measure the
+# scripts without the real files:
+#   age_male.csv, age_female.csv, education.csv (two header
+#   rows), households.csv, income.csv, labour.csv,
+#   language.csv and a manifest.csv for census2011_batch,
+#   census2011_wide and census2011_bench.
+#
+# The columns come from each script's dataColumns and
+# dataTypes.  Rows are in geographic order (Canada, then
+# each province with its cities, CDs, CSDs and DAs); counts
+# of the higher levels are the sums of their DAs, rates and
+# dollar amounts are drawn on their own.  With --bad some DA rows are
+# replaced by the kinds of rows the scripts have to reject.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import sys
+import os
+import csv
+import imp
+import random
+
+from census2011_common import getOption, provinceCodes, cityRanges, openOutput
+from census2011_batch import scriptDir, topicScripts
+
+
+# dissemination areas per province in 2011, scaled to --das
+provinceDAs = {
+        'NL':1070, 'PE':295, 'NS':1645, 'NB':1454, 'QC':13648, 'ON':19964,
+        'MB':2192, 'SK':2471, 'AB':5308, 'BC':7424, 'YT':67, 'NT':89, 'NU':48 }
+provinceNames = {
+        'NL':'Newfoundland and Labrador', 'PE':'Prince Edward Island', 'NS':'Nova Scotia',
+        'NB':'New Brunswick', 'QC':'Quebec', 'ON':'Ontario', 'MB':'Manitoba',
+        'SK':'Saskatchewan', 'AB':'Alberta', 'BC':'British Columbia', 'YT':'Yukon',
+        'NT':'Northwest Territories', 'NU':'Nunavut' }
+dasPerCD = 190
+dasPerCSD = 10
+inputFileNames = {
+        'age':['age_male.csv', 'age_female.csv'],
+        'education':['education.csv'],
+        'households':['households.csv'],
+        'income':['income.csv'],
+        'labour':['labour.csv'],
+        'language':['language.csv'] }
+
+
+def makeGeography( das ):
+    # [(uid, name, level, DA indexes), ...] in output order, where level is
+    # CANADA, PR, CITY, CD, CSD or DA and each row lists the DAs it holds
+    total = sum( provinceDAs.values() )
+    geography = []
+    daIndex = 0
+    for prov in sorted( provinceCodes, key=provinceCodes.get ):
+        code = provinceCodes[prov]
+        n = max( 1, int( round( das * provinceDAs[prov] / float( total ))))
+        cdCount = min( 99, max( 1, n // dasPerCD ))
+        first = daIndex
+        rows = []
+        for cd in range(0, cdCount):
+            size = n // cdCount + (1 if cd < n % cdCount else 0)
+            cdUid = '%d%02d' % (code, cd + 1)
+            rows.append( (cdUid, 'Division No. %d' % (cd + 1), 'CD', range( daIndex, daIndex + size )) )
+            for csd in range(0, (size + dasPerCSD - 1) // dasPerCSD):
+                members = range( daIndex + csd * dasPerCSD, daIndex + min( size, (csd + 1) * dasPerCSD ))
+                rows.append( ('%s%03d' % (cdUid, csd + 1), 'Subdivision %d, "%s"' % (csd + 1, cdUid), 'CSD', members) )
+            for da in range(0, size):
+                rows.append( ('%s%04d' % (cdUid, da + 1), 'DA', 'DA', [daIndex + da]) )
+            daIndex += size
+        geography.append( ('%d' % code, provinceNames[prov], 'PR', range( first, daIndex )) )
+        if prov in cityRanges:
+            low, high = cityRanges[prov]
+            for city in range(low + 1, min( high, low + 4 )):
+                geography.append( ('%03d' % city, 'City %03d' % city, 'CITY', range( first, min( daIndex, first + 50 ))) )
+        geography += rows
+    return [('01', 'Canada', 'CANADA', range( 0, daIndex ))] + geography, daIndex
+
+
+def drawDA( columns, additive, rng ):
+    # one DA's counts: a population split over the count columns, the first
+    # column being the total of the others (0 for the non-additive columns)
+    population = rng.randint( 200, 1200 )
+    share = 2.0 * population / max( 1, len( columns ))
+    cells = [int( rng.random() * share ) if additive[n] else 0 for n in range(0, len(columns))]
+    if additive[0]:
+        cells[0] = sum( cells[1:] )
+    return cells
+
+
+def fillCells( cells, types, additive, rng ):
+    # the output text of one row's cells, drawing the non-additive ones
+    text = []
+    for n in range(0, len(types)):
+        if additive[n]:
+            text.append( str( cells[n] ))
+        elif types[n] == 'rate':
+            text.append( '%.1f' % (rng.random() * 100) )
+        else:
+            text.append( str( rng.randint( 15000, 120000 )))
+    return text
+
+
+def badRow( name, cells, rng ):
+    # a DA row the scripts should reject or repair
+    kind = rng.randint( 0, 5 )
+    if kind == 0:
+        return [name] + ['x'] + cells[1:]  # suppressed
+    if kind == 1:
+        return [name] + ['..'] + cells[1:]  # not available
+    if kind == 2:
+        return [name] + cells[:len(cells) // 2]  # short row
+    if kind == 3:
+        return [name] + [str( int( cells[0] ) + 500 )] + cells[1:]  # total does not add up
+    if kind == 4:
+        return ['Note: %s was revised' % name] + cells  # no UID
+    return ['%s\nfootnote 1' % name] + cells  # multi-line field
+
+
+def writeTopic( fileName, columns, types, geography, daCount, rng, badRate=0.0, twoRowHeader=False,
+                sortRows=False, level=None ):
+    # one input file: Geography, the topic's columns and a Notes column
+    columns = columns[1:]
+    types = types[1:]
+    additive = [t == 'count' for t in types]
+    das = [drawDA( columns, additive, rng ) for n in range(0, daCount)]
+
+    f = openOutput( fileName, level )
+    writer = csv.writer( f, lineterminator='\n' )
+    header = ['Geography'] + columns + ['Notes']
+    if twoRowHeader:
+        writer.writerow( ['' if c == 'Geography' else c.split( '.', 1 )[0] for c in header] )
+        writer.writerow( [c if c == 'Geography' else c.split( '.', 1 )[-1] for c in header] )
+    else:
+        writer.writerow( header )
+
+    if sortRows:
+        geography = sorted( geography, key=lambda g: int( g[0] ))
+    for uid, name, geoLevel, members in geography:
+        if geoLevel == 'DA':
+            cells = das[members[0]]
+        else:
+            cells = [sum( column ) for column in zip( *[das[m] for m in members] )]
+        name = '%s (%s)' % (name, uid)
+        text = fillCells( cells, types, additive, rng )
+        if (geoLevel == 'DA') and badRate and (rng.random() < badRate):
+            writer.writerow( badRow( name, text, rng ) )
+        else:
+            writer.writerow( [name] + text + [''] )
+    if badRate:
+        writer.writerow( ['Symbol legend:'] )
+        writer.writerow( ['".." not available for a specific reference period'] )
+    f.close()
+
+
+def loadColumns( topic ):
+    # the topic script's dataColumns and dataTypes
+    module = imp.load_source( 'census2011_synth_' + topic, os.path.join( scriptDir, topicScripts[topic] ))
+    return module.dataColumns, module.dataTypes
+
+
+def getCommandLine():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    options = [a for a in sys.argv[1:] if a.startswith('--')]
+    if (len(args) ==1):
+        return args[0],options
+    return "",options
+
+
+def printUsage():
+    print "Usage:"
+    print "python " + sys.argv[0] + " <OUTPUTDIR> [options]\n"
+    print "  --das=N     number of dissemination areas (default 55000, all of Canada)"
+    print "  --bad=RATE  share of DA rows replaced by bad rows (default 0)"
+    print "  --seed=N    random seed (default 2011)"
+    print "  --topics=age,income,..   topics to write (default all)"
+    print "  --sorted    rows in UID order (for census2011_age.py --stream)"
+    print "  --compress=gz|bz2|xz   compress the inputs (--compress-level=1..9)\n"
+
+
+if __name__ == "__main__":
+    print "Format Census 2011: synthetic inputs"
+
+    outputDir,options = getCommandLine()
+    if (not outputDir) :
+        printUsage()
+        sys.exit(1)
+
+    topics = getOption( options, 'topics', ','.join( sorted( topicScripts ))).split( ',' )
+    for topic in topics:
+        if topic not in topicScripts:
+            print ">>unknown topic: " + topic
+            sys.exit(1)
+    rng = random.Random( int( getOption( options, 'seed', 2011 )))
+    badRate = float( getOption( options, 'bad', 0 ))
+    suffix = '.' + getOption( options, 'compress' ) if getOption( options, 'compress' ) else ''
+    level = int( getOption( options, 'compress-level' )) if getOption( options, 'compress-level' ) else None
+
+    geography, daCount = makeGeography( int( getOption( options, 'das', 55000 )))
+    print "Geography: %d rows, %d DAs" % (len( geography ), daCount)
+    if not os.path.isdir( os.path.join( outputDir, 'out' )):
+        os.makedirs( os.path.join( outputDir, 'out' ))
+
+    manifest = open( os.path.join( outputDir, 'manifest.csv' ), 'w' )
+    manifest.write( '# topic,stub,inputs (written by census2011_synth.py)\n' )
+    for topic in topics:
+        columns, types = loadColumns( topic )
+        names = [os.path.join( outputDir, name + suffix ) for name in inputFileNames[topic]]
+        for name in names:
+            print ">>writeTopic - writing: " + name
+            writeTopic( name, columns, types, geography, daCount, rng, badRate,
+                    twoRowHeader=(topic == 'education'), sortRows='--sorted' in options, level=level )
+        manifest.write( ','.join( [topic, os.path.join( outputDir, 'out', topic )] + names ) + '\n' )
+    manifest.close()
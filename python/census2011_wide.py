@@ -0,0 +1,175 @@
+###########################################################
+# census2011_wide.py
+#
+# Join the topics of a batch manifest (see census2011_batch)
+# on UID and write one wide table per geo level, instead of
+# one set of tables per topic:
+#   <OUTPUTSTUB>_<LEVEL>.csv  UID,GEOGRAPHY,<age...>,<income...>,...
+#
+# Every input is parsed once by its own topic script and the
+# topics are merged on UID as their records are read, so only
+# a record of each is held at a time.  Each script puts its
+# input in UID order with an external sort (census2011_sort),
+# holding --sort-rows rows per topic; with --stream the inputs
+# are already sorted by UID and are read straight through.  As
+# in the topic scripts, the last row of a UID is the one kept.
+# A level's table only has the columns of the topics
+# that have that level (CITY is only in some of them); a
+# topic with no row for a UID leaves its columns empty.
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import sys
+import os
+import imp
+import heapq
+from operator import itemgetter
+
+from census2011_common import getOption, selectProvinces, OutputSet, createPool, closePool, \
+        openInput, rejects
+from census2011_batch import scriptDir, topicScripts, readManifest
+import census2011_sort
+
+
+def loadTopic( job, n, options, runSize ):
+    # a private copy of the job's topic script, set up for this run's
+    # provinces; runSize None: its inputs are sorted by UID already
+    module = imp.load_source( 'census2011_wide_%d_%s' % (n, job['topic']),
+            os.path.join( scriptDir, topicScripts[job['topic']] ))
+    module.script.configure( [o for o in options if o.startswith( '--provinces=' )] )
+    module.script.inputRunSize = runSize
+    return module
+
+
+def topicHeaders( module ):
+    # output column names of a topic, without UID and GEOGRAPHY
+    return module.script.columnHeaders[2:]
+
+
+def unionLevels( modules ):
+    # every geo level used by any topic, in codeLength order
+    levels = {}
+    for module in modules:
+        for level in module.geoLevels:
+            levels.setdefault( level['code'], level )
+    return sorted( levels.values(), key=itemgetter( 'codeLength' ))
+
+
+def sortedRecords( module, inputFiles, n, pool ):
+    # (id, n, record) for every output record of a topic, in UID order,
+    # as its script streams them
+    lastId = None
+    for record in module.script.iterRecords( inputFiles, True, pool ):
+        if (lastId is not None) and (record[0] < lastId):
+            raise ValueError( "%s is not sorted by UID at %d" % (inputFiles[0].name, record[0]) )
+        lastId = record[0]
+        yield record[0], n, record
+
+
+def joinTopics( streams, widths ):
+    # merges the sorted topic streams and yields id, name, [values of
+    # topic 0 or None, values of topic 1 or None, ...]
+    current = None
+    for id, n, record in heapq.merge( *streams ):
+        if (current is None) or (id != current[0]):
+            if current is not None:
+                yield current
+            current = (id, record[1], [None] * len(widths))
+        current[2][n] = record[2:]
+    if current is not None:
+        yield current
+
+
+def provinceOf( provinces, id ):
+    return provinces.cityProvince( id ) or provinces.prefixProvince( str(id) )
+
+
+def writeWide( joined, outputFiles, levelTopics, widths, provinces ):
+    for id, name, values in joined:
+        i = outputFiles.router.levelIndex( id )
+        if i is None:
+            continue
+        row = [id, name]
+        for n in levelTopics[i]:
+            row += values[n] if values[n] is not None else [''] * widths[n]
+        outputFiles.writeRow( provinceOf( provinces, id ), id, row )
+    outputFiles.flush()
+
+
+def getCommandLine():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    options = [a for a in sys.argv[1:] if a.startswith('--')]
+    if (len(args) ==2):
+        if os.path.isfile( args[0] ) :
+            return args[0],args[1],options
+    return "","",options
+
+
+def printUsage():
+    print "Usage:"
+    print "python " + sys.argv[0] + " <MANIFEST.csv> <OUTPUTSTUB> [options]\n"
+    print "  the manifest is the one census2011_batch.py reads; its output stubs are ignored"
+    print "  --stream   the inputs are sorted by UID; read them straight through"
+    print "  --sort-rows=ROWS   rows of each topic sorted in memory at a time, the rest in"
+    print "      temporary files (default %d)" % census2011_sort.runSize
+    print "  --provinces=BC,AB,..   write <OUTPUTSTUB>_<PROV>_<LEVEL>.csv for each province"
+    print "  --compress=gz|bz2|xz   compress the outputs (--compress-level=1..9)"
+    print "  --rejects=FILE   write the rows that were dropped, and why, to FILE"
+    print "  --workers=N   parse the inputs with N processes\n"
+
+
+if __name__ == "__main__":
+    print "Format Census 2011: wide table"
+
+    manifestFileName,outputStub,options = getCommandLine()
+    if (not manifestFileName) :
+        printUsage()
+        sys.exit(1)
+
+    jobs, errors = readManifest( open( manifestFileName ))
+    if errors:
+        for error in errors:
+            print ">>readManifest: " + error
+        sys.exit(1)
+
+    provinces = selectProvinces( getOption( options, 'provinces' ) )
+    runSize = None if '--stream' in options else int( getOption( options, 'sort-rows', census2011_sort.runSize ))
+    modules = [loadTopic( jobs[n], n, options, runSize ) for n in range(0, len(jobs))]
+    headers = [topicHeaders( module ) for module in modules]
+    widths = [len( h ) for h in headers]
+    geoLevels = unionLevels( modules )
+
+    # columns of each level: the topics that have it
+    levelTopics = []
+    for level in geoLevels:
+        levelTopics.append( [n for n in range(0, len(modules))
+                             if level['code'] in [l['code'] for l in modules[n].geoLevels]] )
+
+    # names used by more than one topic get the topic as a prefix
+    allHeaders = sum( headers, [] )
+    for n in range(0, len(jobs)):
+        headers[n] = [h if allHeaders.count( h ) == 1 else jobs[n]['topic'].upper() + '_' + h for h in headers[n]]
+
+    level = getOption( options, 'compress-level' )
+    outputFiles = OutputSet( outputStub, geoLevels, provinces,
+            compress=getOption( options, 'compress' ), level=int( level ) if level else None )
+    for (name, i), f in outputFiles.byKey.items():
+        f.write( ','.join( ['UID', 'GEOGRAPHY'] + sum( [headers[n] for n in levelTopics[i]], [] )) + '\n' )
+
+    if getOption( options, 'rejects' ):
+        rejects.open( getOption( options, 'rejects' ))
+    inputFiles = [[openInput( name ) for name in job['inputs']] for job in jobs]
+    pool = createPool( int( getOption( options, 'workers', 1 )))
+    try:
+        streams = [sortedRecords( modules[n], inputFiles[n], n, pool ) for n in range(0, len(jobs))]
+        writeWide( joinTopics( streams, widths ), outputFiles, levelTopics, widths, provinces )
+    finally:
+        closePool( pool )
+
+    for f in sum( inputFiles, [] ):
+        print ">>closeFiles - closing:" + f.name
+        f.close()
+    outputFiles.close()
+    rejects.close()
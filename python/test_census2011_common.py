@@ -0,0 +1,245 @@
+###########################################################
+# test_census2011_common.py
+#
+# Checks of the fast paths in census2011_common (and the age
+# script's join) against the plain code they stand in for.
+# Run from this directory with:
+#   python -m unittest discover
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import os
+import re
+import csv
+import sys
+import pickle
+import random
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+from census2011_common import ProjectedReader, RowConverter, parseGeographyUID, mappedLines, \
+        RangeParser, runningScripts, readHeader
+import census2011_age
+
+
+header = 'Geography,Total,Male,Female\n'
+columns = ['Geography', 'Total', 'Female']
+markers = ['(59']
+
+
+class MappedLinesTest(unittest.TestCase):
+    # ProjectedReader reads a plain file through mappedLines, anything else
+    # line by line; both must give the same rows
+
+    def setUp( self ):
+        self.dir = tempfile.mkdtemp( prefix='census2011_test' )
+
+    def tearDown( self ):
+        shutil.rmtree( self.dir )
+
+    def compare( self, text ):
+        fileName = os.path.join( self.dir, 'input.csv' )
+        f = open( fileName, 'wb' )
+        f.write( text )
+        f.close()
+        f = open( fileName, 'rb' )
+        mapped = list( ProjectedReader( f, columns, prefilter=markers ))
+        f.close()
+        plain = list( ProjectedReader( StringIO( text ), columns, prefilter=markers ))
+        self.assertEqual( mapped, plain )
+        return mapped
+
+    def testPlain( self ):
+        rows = self.compare( header + 'Canada (01),10,4,6\nBurnaby (5915025),5,2,3\nCalgary (4806016),7,3,4\n' )
+        self.assertEqual( rows, [['Burnaby (5915025)', '5', '3']] )
+
+    def testCRLF( self ):
+        rows = self.compare( header.replace( '\n', '\r\n' ) +
+                'Burnaby (5915025),5,2,3\r\nCalgary (4806016),7,3,4\r\nSurrey (5915004),9,4,5\r\n' )
+        self.assertEqual( rows, [['Burnaby (5915025)', '5', '3'], ['Surrey (5915004)', '9', '5']] )
+
+    def testNoTrailingNewline( self ):
+        rows = self.compare( header + 'Calgary (4806016),7,3,4\nSurrey (5915004),9,4,5' )
+        self.assertEqual( rows, [['Surrey (5915004)', '9', '5']] )
+
+    def testQuoted( self ):
+        rows = self.compare( header +
+                '"Victoria, City of (5917034)",8,4,4\n'
+                '"Edmonton, City of (4811061)",6,3,3\n'
+                'Burnaby (5915025),5,2,3\n' )
+        self.assertEqual( rows, [['Victoria, City of (5917034)', '8', '4'], ['Burnaby (5915025)', '5', '3']] )
+
+    def testMultiLineField( self ):
+        # the marker is on the second line of the quoted field, or missing
+        # from both lines of it; a field over lines is always parsed
+        rows = self.compare( header +
+                '"Kelowna\n(5935010)",3,1,2\n'
+                '"Red Deer\n(4808011)",4,2,2\r\n'
+                'Burnaby (5915025),5,2,3\n'
+                '"Regina\n(4706027)",2,1,1' )
+        self.assertEqual( rows, [['Kelowna\n(5935010)', '3', '2'], ['Red Deer\n(4808011)', '4', '2'],
+                ['Burnaby (5915025)', '5', '3'], ['Regina\n(4706027)', '2', '1']] )
+
+    def testEmpty( self ):
+        self.assertEqual( self.compare( header ), [] )
+        self.assertEqual( self.compare( header.rstrip( '\n' )), [] )
+
+    def testMappedLinesKeepsHits( self ):
+        # every line with a marker comes back, whole
+        fileName = os.path.join( self.dir, 'lines.csv' )
+        lines = ['Burnaby (5915025),5\n', 'Calgary (4806016),7\n', 'Surrey (5915004),9']
+        f = open( fileName, 'wb' )
+        f.write( ''.join( lines ))
+        f.close()
+        f = open( fileName, 'rb' )
+        self.assertEqual( list( mappedLines( f, markers )), [lines[0], lines[2]] )
+        f.close()
+
+
+class RangeParserTest(unittest.TestCase):
+    # what a worker process gets from a RangeParser, forked or spawned
+
+    def setUp( self ):
+        self.dir = tempfile.mkdtemp( prefix='census2011_test' )
+        import census2011_langauge
+        self.module = census2011_langauge
+        self.fileName = os.path.join( self.dir, 'language.csv' )
+        f = open( self.fileName, 'wb' )
+        writer = csv.writer( f, lineterminator='\n' )
+        writer.writerow( self.module.dataColumns )
+        for name, total in [('Burnaby (5915025)', 5), ('Calgary (4806016)', 7), ('Edmonton (4811061)', 6)]:
+            writer.writerow( [name] + [total] * (len( self.module.dataColumns ) - 1) )
+        f.close()
+        self.module.script.configure( ['--provinces=AB'] )
+
+    def tearDown( self ):
+        shutil.rmtree( self.dir )
+        self.module.script.configure( [] )
+        runningScripts.pop( self.module.__name__, None )
+
+    def parse( self, parser ):
+        f = open( self.fileName, 'rb' )
+        fieldNames = readHeader( f, 1 )
+        start = f.tell()
+        f.close()
+        return parser( (self.fileName, start, os.path.getsize( self.fileName ), fieldNames) )
+
+    def rows( self, rows ):
+        return [(rowId, data[:2]) for rowId, data in rows]
+
+    def testForked( self ):
+        parser = pickle.loads( pickle.dumps( RangeParser( self.module.script )))
+        self.assertEqual( self.rows( self.parse( parser )),
+                [(4806016, ['Calgary (4806016)', 7]), (4811061, ['Edmonton (4811061)', 6])] )
+
+    def testSpawned( self ):
+        # no script in the worker yet: the module is imported again and its
+        # script configured with the same options
+        data = pickle.dumps( RangeParser( self.module.script ))
+        del runningScripts[self.module.__name__]
+        del sys.modules[self.module.__name__]
+        try:
+            parser = pickle.loads( data )
+            self.assertEqual( self.rows( self.parse( parser )),
+                    [(4806016, ['Calgary (4806016)', 7]), (4811061, ['Edmonton (4811061)', 6])] )
+            self.assertTrue( runningScripts[self.module.__name__] is not self.module.script )
+        finally:
+            sys.modules[self.module.__name__] = self.module
+
+
+class ParseGeographyUIDTest(unittest.TestCase):
+    # parseGeographyUID is the first match of this, without the regex engine
+    pattern = re.compile( r"\((\d+)\)" )
+
+    def expected( self, geography ):
+        match = self.pattern.search( geography )
+        return match.group( 1 ) if match else None
+
+    def testCases( self ):
+        for geography in ['Burnaby (5915025)', 'Burnaby', '', '()', '(59', '59)', '(x)(59)',
+                          'A (B) (5915)', '((59))', '(59 15)', '(-59)', '(59)(60)', 'Name (59) (x',
+                          '(', ')', ')(59)', 'N.W.T. (61) footnote (1)']:
+            self.assertEqual( parseGeographyUID( geography ), self.expected( geography ), geography )
+
+    def testRandom( self ):
+        rng = random.Random( 2011 )
+        for n in range(0, 20000):
+            geography = ''.join( [rng.choice( '(()) 0159ax' ) for i in range(0, rng.randint( 0, 12 ))] )
+            self.assertEqual( parseGeographyUID( geography ), self.expected( geography ), geography )
+
+
+class MergeJoinTest(unittest.TestCase):
+    # mergeJoin of sorted rows gives what hashJoin does of the same rows
+
+    def join( self, csvA, csvB ):
+        merged = list( census2011_age.mergeJoin( iter( sorted( csvA.items() )), iter( sorted( csvB.items() ))))
+        self.assertEqual( merged, list( census2011_age.hashJoin( csvA, csvB )))
+        return merged
+
+    def testBothSides( self ):
+        self.assertEqual( self.join( {1:'a1', 2:'a2'}, {1:'b1', 2:'b2'} ), [(1, 'a1', 'b1'), (2, 'a2', 'b2')] )
+
+    def testMissingSides( self ):
+        self.assertEqual( self.join( {1:'a1', 3:'a3', 4:'a4'}, {2:'b2', 3:'b3', 5:'b5'} ),
+                [(1, 'a1', None), (2, None, 'b2'), (3, 'a3', 'b3'), (4, 'a4', None), (5, None, 'b5')] )
+
+    def testEmptySide( self ):
+        self.assertEqual( self.join( {}, {1:'b1', 2:'b2'} ), [(1, None, 'b1'), (2, None, 'b2')] )
+        self.assertEqual( self.join( {1:'a1'}, {} ), [(1, 'a1', None)] )
+        self.assertEqual( self.join( {}, {} ), [] )
+
+    def testRandom( self ):
+        rng = random.Random( 2011 )
+        for n in range(0, 200):
+            csvA = dict( [(id, 'a%d' % id) for id in rng.sample( range(0, 60), rng.randint( 0, 30 ))] )
+            csvB = dict( [(id, 'b%d' % id) for id in rng.sample( range(0, 60), rng.randint( 0, 30 ))] )
+            self.join( csvA, csvB )
+
+
+class RowConverterTest(unittest.TestCase):
+    types = ['text', 'count', 'count', 'rate', 'dollars', 'dollars']
+
+    def testFast( self ):
+        convert = RowConverter( self.types )
+        self.assertEqual( convert( ['Burnaby (5915025)', '10', '4', '2.5', '41000', '43500'] ),
+                ['Burnaby (5915025)', 10, 4, 2.5, 41000, 43500] )
+
+    def testSuppressed( self ):
+        convert = RowConverter( self.types )
+        self.assertEqual( convert( ['Burnaby', 'x', '4', '..', 'F', ''] ), ['Burnaby', None, 4, None, None, None] )
+        self.assertEqual( convert( ['Burnaby', ' X ', '...', '2', '1', '2'] ), ['Burnaby', None, None, 2, 1, 2] )
+
+    def testWrittenAsFloat( self ):
+        convert = RowConverter( self.types )
+        self.assertEqual( convert( ['Burnaby', '12.0', '4', '65.0', '41000.0', '43500.5'] ),
+                ['Burnaby', 12, 4, 65, 41000, 43500.5] )
+
+    def testWrittenBack( self ):
+        # whole numbers are written as read, of every type
+        out = StringIO()
+        csv.writer( out ).writerow( RowConverter( ['text', 'count', 'rate', 'rate', 'dollars'] )(
+                ['A', '12', '65', '2.5', '41000.0'] ))
+        self.assertEqual( out.getvalue(), 'A,12,65,2.5,41000\r\n' )
+
+    def testNotANumber( self ):
+        convert = RowConverter( self.types )
+        for row in [['Burnaby', 'ten', '4', '2', '1', '2'], ['Burnaby', '1', '4', 'two', '1', '2'],
+                    ['Burnaby', '1', '4', '2', '1', 'two']]:
+            self.assertRaises( ValueError, convert, row )
+
+    def testSameAsCellByCell( self ):
+        # the runs give what converting each cell on its own does
+        from census2011_common import cellConverters
+        convert = RowConverter( self.types )
+        rng = random.Random( 2011 )
+        for n in range(0, 2000):
+            row = ['Name'] + [rng.choice( ['0', '7', '12.0', '3.5', 'x', '..', '', 'F'] ) for t in self.types[1:]]
+            self.assertEqual( convert( row ), [cellConverters[t]( cell ) for t, cell in zip( self.types, row )] )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+###########################################################
+# test_census2011_lookup.py
+#
+# Point lookups of census2011_lookup against the rows the
+# index was built from.
+# Run from this directory with:
+#   python -m unittest discover
+#
+# Author: agent
+# Date:   2026 October 18
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from census2011_lookup import LevelIndex, CensusIndex
+
+
+header = ['UID', 'GEOGRAPHY', 'TOTALPOP', 'M0_4', 'RATE']
+rows = [
+        (59010002, 'Two', ['40', 'x', '2.5']),
+        (59010001, 'One', ['93', '12', '']),
+        (59020001, 'Three', ['7', '3', '1'])
+    ]
+
+
+class CensusIndexTest(unittest.TestCase):
+
+    def setUp( self ):
+        self.index = CensusIndex( 'test', [LevelIndex.fromRows( 'DA', 8, header, rows )] )
+
+    def testValue( self ):
+        self.assertEqual( self.index.value( 59010001, 'TOTALPOP' ), 93 )
+        self.assertEqual( self.index.value( 59010002, 'RATE' ), 2.5 )
+        self.assertEqual( self.index.value( 59010001, 'RATE' ), None )
+        self.assertEqual( self.index.value( 59010002, 'M0_4' ), None )
+
+    def testUidAndName( self ):
+        for uid, name, cells in rows:
+            self.assertEqual( self.index.value( uid, 'UID' ), uid )
+            self.assertEqual( self.index.value( uid, 'GEOGRAPHY' ), name )
+
+    def testUnknown( self ):
+        self.assertRaises( KeyError, self.index.value, 59010001, 'NOTACOLUMN' )
+        self.assertRaises( KeyError, self.index.value, 59010003, 'TOTALPOP' )
+
+    def testGetMatchesValue( self ):
+        for uid, name, cells in rows:
+            row = self.index.get( uid )
+            for column in header:
+                self.assertEqual( row[column], self.index.value( uid, column ))
+
+    def testSnapshot( self ):
+        directory = tempfile.mkdtemp( prefix='census2011_test' )
+        try:
+            fileName = os.path.join( directory, 'index.snapshot' )
+            self.index.save( fileName )
+            loaded = CensusIndex.load( fileName )
+        finally:
+            shutil.rmtree( directory )
+        for uid, name, cells in rows:
+            self.assertEqual( loaded.get( uid ), self.index.get( uid ))
+        self.assertEqual( [row['UID'] for row in loaded.within( 5901 )], [59010001, 59010002] )
+
+
+if __name__ == "__main__":
+    unittest.main()